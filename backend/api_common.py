@@ -0,0 +1,167 @@
+'''
+Settings and request helpers shared by flaskr and the async app
+(aioflaskr), so both answer alike. The async app is installed without
+Flask and SQLAlchemy, so this module imports neither; aborts go through
+Werkzeug, which both frameworks handle.
+'''
+import base64
+import binascii
+import json
+import os
+
+from werkzeug.exceptions import abort
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+QUESTIONS_PER_PAGE = 10
+QUESTION_FIELDS = ('id', 'question', 'answer', 'category', 'difficulty')
+
+# seconds the reference data caches keep their values
+CATEGORY_CACHE_TTL = 300
+QUESTION_COUNT_TTL = 60
+
+# access control headers of every response
+CORS_ALLOW_HEADERS = 'Content-Type,Authorization,Prefer,true'
+CORS_ALLOW_METHODS = 'GET,PUT,POST,PATCH,DELETE,OPTIONS'
+
+'''
+parse_bool(value)
+    reads a boolean setting from an environment variable
+'''
+def parse_bool(value):
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+# (engine option, setting, default, parser of the environment variable);
+# each worker holds at most pool_size + max_overflow connections and
+# waits pool_timeout seconds for one before failing the request
+POOL_SETTINGS = (
+    ('pool_size', 'DB_POOL_SIZE', 5, int),
+    ('max_overflow', 'DB_MAX_OVERFLOW', 5, int),
+    ('pool_timeout', 'DB_POOL_TIMEOUT', 10, int),
+    ('pool_recycle', 'DB_POOL_RECYCLE', 1800, int),
+    ('pool_pre_ping', 'DB_POOL_PRE_PING', True, parse_bool),
+)
+
+# milliseconds a statement may run before Postgres cancels it, 0 for no limit
+DB_STATEMENT_TIMEOUT = 10000
+# seconds to wait for a new connection to the server, 0 for no limit; this
+# bounds how long a request checking an unreachable replica can hang
+DB_CONNECT_TIMEOUT = 3
+
+'''
+get_setting(config, name, default, parse)
+    returns a setting from the app config, else from the environment
+    variable of the same name, else the default
+'''
+def get_setting(config, name, default, parse=str):
+    if name in config:
+        return config[name]
+    if name in os.environ:
+        return parse(os.environ[name])
+    return default
+
+'''
+encode_cursor(question_id)
+    turns the id of the last question on a page into an opaque cursor
+'''
+def encode_cursor(question_id):
+    return base64.urlsafe_b64encode(str(question_id).encode()).decode().rstrip('=')
+
+'''
+decode_cursor(cursor)
+    returns the question id a cursor points after, or None if it is
+    malformed
+'''
+def decode_cursor(cursor):
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        return int(base64.urlsafe_b64decode(cursor + padding).decode())
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        return None
+
+'''
+get_after_id(args)
+    reads the keyset position from the cursor or after_id arguments;
+    aborts with 400 if the position can't be parsed
+'''
+def get_after_id(args):
+    cursor = args.get('cursor')
+    if cursor is not None:
+        after_id = decode_cursor(cursor)
+        if after_id is None:
+            abort(400)
+        return after_id
+
+    after_id = args.get('after_id')
+    if after_id is not None:
+        if not after_id.isdigit():
+            abort(400)
+        return int(after_id)
+
+    return None
+
+'''
+get_fields(args)
+    returns the question fields listed in the fields argument, always
+    with id, or None when all fields are wanted; aborts with 400 for
+    unknown fields
+'''
+def get_fields(args):
+    fields = args.get('fields')
+    if fields is None:
+        return None
+
+    fields = [field.strip() for field in fields.split(',') if field.strip()]
+    if any(field not in QUESTION_FIELDS for field in fields):
+        abort(400)
+
+    return ['id'] + [field for field in QUESTION_FIELDS
+                     if field in fields and field != 'id']
+
+'''
+next_cursor(current_questions)
+    returns the cursor of the page after current_questions, or None
+    when it was the last page
+'''
+def next_cursor(current_questions):
+    # a short page is the last one
+    if len(current_questions) < QUESTIONS_PER_PAGE:
+        return None
+
+    return encode_cursor(current_questions[-1]['id'])
+
+'''
+dumps_json(payload)
+    encodes a payload with the standard library, compactly and unsorted
+'''
+def dumps_json(payload):
+    return json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+'''
+dumps_orjson(payload)
+    encodes a payload with orjson; integer keys, like the category ids
+    of the categories map, are written as strings as json does
+'''
+def dumps_orjson(payload):
+    return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+
+SERIALIZERS = {
+    'json': dumps_json,
+    'orjson': dumps_orjson
+}
+
+'''
+get_serializer(name)
+    returns the JSON serializer called name, orjson when it is installed
+    and json if not for None; raises ValueError if it is unavailable
+'''
+def get_serializer(name=None):
+    if name is None:
+        name = 'orjson' if orjson is not None else 'json'
+    if name not in SERIALIZERS or (name == 'orjson' and orjson is None):
+        raise ValueError('unavailable JSON_SERIALIZER: {}'.format(name))
+
+    return SERIALIZERS[name]
@@ -0,0 +1,121 @@
+'''
+Compares quiz traffic on the WSGI app (flaskr) and the ASGI app (aioflaskr).
+
+    gunicorn -w 1 --threads 8 -b :5000 'flaskr:create_app()'
+    hypercorn -w 1 -b :5001 'aioflaskr:create_app()'
+    python benchmarks/async_benchmark.py http://localhost:5000 http://localhost:5001
+
+from the backend folder, with both servers started against the same
+database. Quiz sessions live in process memory, so each server runs a
+single process and the comparison is per process.
+
+Every simulated player starts a quiz session, draws --questions
+questions and finishes the session; --concurrency players play at once
+until --sessions sessions have been played against each server.
+Throughput and latency percentiles are printed per server.
+
+The load is generated by one asyncio process with keep-alive
+connections, so it can hold many more concurrent players than the
+servers under test.
+'''
+import argparse
+import asyncio
+import json
+import time
+from urllib.parse import urlsplit
+
+class Connection:
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.reader = self.writer = None
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+    async def request(self, method, path, body=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(
+                self.host, self.port)
+
+        data = json.dumps(body).encode() if body is not None else b''
+        head = ('{} {} HTTP/1.1\r\nHost: {}:{}\r\n'
+                'Content-Type: application/json\r\nContent-Length: {}\r\n\r\n'
+                ).format(method, path, self.host, self.port, len(data))
+        self.writer.write(head.encode('latin-1') + data)
+        await self.writer.drain()
+
+        version, status = (await self.reader.readline()).split()[:2]
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        payload = await self.reader.readexactly(int(headers.get('content-length', 0)))
+        # servers speaking HTTP/1.0, like the werkzeug one, close each connection
+        if version != b'HTTP/1.1' or headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return int(status), json.loads(payload) if payload else None
+
+async def play(connection, questions, latencies):
+    async def timed(method, path, body=None):
+        start = time.perf_counter()
+        status, payload = await connection.request(method, path, body)
+        latencies.append(time.perf_counter() - start)
+        if status != 200:
+            raise RuntimeError('{} {} answered {}'.format(method, path, status))
+        return payload
+
+    session = await timed('POST', '/quizzes/sessions', {'quiz_category': {'id': 0}})
+    session_id = session['session_id']
+    for _ in range(questions):
+        await timed('POST', '/quizzes/sessions/{}/next'.format(session_id))
+    await timed('DELETE', '/quizzes/sessions/{}'.format(session_id))
+
+async def run(url, sessions, concurrency, questions):
+    latencies = []
+    remaining = iter(range(sessions))
+
+    async def player():
+        connection = Connection(url)
+        try:
+            for _ in remaining:
+                await play(connection, questions, latencies)
+        finally:
+            await connection.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(player() for _ in range(concurrency)))
+    return time.perf_counter() - start, sorted(latencies)
+
+def percentile(latencies, fraction):
+    return latencies[min(int(len(latencies) * fraction), len(latencies) - 1)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('wsgi_url')
+    parser.add_argument('asgi_url')
+    parser.add_argument('--sessions', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--questions', type=int, default=5)
+    args = parser.parse_args()
+
+    print('{:<6}{:>12}{:>10}{:>10}{:>10}'.format(
+        'server', 'requests/s', 'p50 ms', 'p99 ms', 'max ms'))
+    for name, url in (('wsgi', args.wsgi_url), ('asgi', args.asgi_url)):
+        seconds, latencies = asyncio.run(
+            run(url, args.sessions, args.concurrency, args.questions))
+        print('{:<6}{:>12.0f}{:>10.1f}{:>10.1f}{:>10.1f}'.format(
+            name, len(latencies) / seconds,
+            percentile(latencies, 0.5) * 1000,
+            percentile(latencies, 0.99) * 1000,
+            latencies[-1] * 1000))
+
+if __name__ == '__main__':
+    main()
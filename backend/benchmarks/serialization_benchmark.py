@@ -0,0 +1,84 @@
+'''
+Compares the cost of turning a page of questions into a JSON response.
+
+    python benchmarks/serialization_benchmark.py [--repeat N]
+
+from the backend folder. For 10, 100 and 1000 rows it times:
+
+- orm+format+jsonify: Question instances, format() per row, jsonify
+- rows+json: column row tuples, rows_to_objects, the json serializer
+- rows+orjson: the same with orjson, when it is installed
+
+Questions are built in memory, so the numbers cover materialization and
+serialization but not the database round-trip.
+'''
+import argparse
+import os
+import sys
+import timeit
+from flask import Flask, jsonify
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api_common import QUESTION_FIELDS, orjson
+from models import Question
+from flaskr import serialization
+
+ROW_COUNTS = (10, 100, 1000)
+
+def make_rows(count):
+    return [(i, 'Which dung beetle was worshipped by the ancient Egyptians? #%d' % i,
+             'Scarab', 4, 4) for i in range(1, count + 1)]
+
+def orm_format_jsonify(rows):
+    questions = []
+    for row in rows:
+        question = Question(question=row[1], answer=row[2],
+                            category=row[4], difficulty=row[3])
+        question.id = row[0]
+        questions.append(question)
+    return jsonify({
+        'success': True,
+        'questions': [question.format() for question in questions]
+    }).get_data()
+
+def rows_serializer(rows):
+    return serialization.json_response({
+        'success': True,
+        'questions': serialization.rows_to_objects(QUESTION_FIELDS, rows)
+    }).get_data()
+
+def make_app(serializer):
+    app = Flask(__name__)
+    app.config['JSON_SERIALIZER'] = serializer
+    serialization.init_app(app)
+    return app
+
+def bench(app, function, rows, repeat):
+    with app.app_context():
+        function(rows)
+        seconds = min(timeit.repeat(lambda: function(rows), number=repeat, repeat=3))
+    return repeat / seconds
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    variants = [('orm+format+jsonify', make_app('json'), orm_format_jsonify),
+                ('rows+json', make_app('json'), rows_serializer)]
+    if orjson is not None:
+        variants.append(('rows+orjson', make_app('orjson'), rows_serializer))
+
+    print('{:>6}  {:<20}{:>14}{:>10}'.format('rows', 'variant', 'responses/s', 'speedup'))
+    for count in ROW_COUNTS:
+        rows = make_rows(count)
+        baseline = None
+        for name, app, function in variants:
+            throughput = bench(app, function, rows, args.repeat)
+            baseline = baseline or throughput
+            print('{:>6}  {:<20}{:>14.0f}{:>9.1f}x'.format(
+                count, name, throughput, throughput / baseline))
+
+if __name__ == '__main__':
+    main()
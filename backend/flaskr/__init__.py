@@ -1,28 +1,238 @@
 import os
-from flask import Flask, request, abort, flash, jsonify
+import bisect
+from datetime import timezone
+from flask import (Flask, request, abort, flash, g, Response, current_app,
+                   stream_with_context, has_request_context)
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
-import random
+from sqlalchemy import func
+from sqlalchemy.orm import load_only
+
+from api_common import (QUESTIONS_PER_PAGE, QUESTION_FIELDS, CORS_ALLOW_HEADERS,
+                        CORS_ALLOW_METHODS, get_setting, get_after_id,
+                        get_fields, next_cursor)
+from models import setup_db, db, Question, on_write
+from pool import watch_pool
+from routing import DB_REPLICA_STICKY_SECONDS
+from . import bulk, cache, compression, quiz, search, search_index, serialization
+from .serialization import json_response
+
+# GET endpoints answered with 304 Not Modified while the data is unchanged
+CONDITIONAL_ENDPOINTS = ('get_categories', 'get_questions',
+                         'get_questions_by_category', 'get_question')
+# non-GET endpoints that only read, and can read from the replica
+REPLICA_ENDPOINTS = ('search_question', 'get_random_quiz_question',
+                     'start_quiz_session', 'next_quiz_question')
+# cookie keeping a client that wrote on the primary for its next reads
+PRIMARY_COOKIE = 'trivia_primary'
+# cookie skipping 304s for a client that wrote, possibly on another worker
+# whose writes the validators of this one don't see yet
+WROTE_COOKIE = 'trivia_wrote'
+# response styles a client can ask a write to answer with
+RETURN_PREFERENCES = ('minimal', 'representation')
+
+# utility for reading how much a write should answer with
+def wants_minimal_response(request):
+  '''
+  Returns True if a write should answer with just its status and id, as
+  asked for with ?return=minimal or a Prefer: return=minimal header.
+  Without either the MUTATION_RESPONSE setting applies. Aborts with 400
+  for unknown values of the return argument.
+  '''
+  preference = request.args.get('return')
+  if (preference is None):
+    for token in request.headers.get('Prefer', '').split(','):
+      name, _, value = token.strip().partition('=')
+      if (name.lower() == 'return' and value in RETURN_PREFERENCES):
+        preference = value
+  elif (preference not in RETURN_PREFERENCES):
+    abort(400)
+
+  if (preference is None):
+    preference = current_app.config['MUTATION_RESPONSE']
+  return preference == 'minimal'
+
+# utility for loading only the requested question columns
+def select_fields(selection, fields):
+  '''
+  Restricts a question query to the columns of fields with load_only,
+  so the other columns are neither selected nor sent.
+  '''
+  if (fields is None):
+    return selection
+
+  return selection.options(
+      load_only(*[getattr(Question, field) for field in fields]))
+
+# utility for selecting the requested question columns
+def select_columns(selection, fields):
+  '''
+  Turns a question query into a query of the columns of fields
+  (all by default), returning plain row tuples instead of ORM instances.
+  Returns the query and the column names.
+  '''
+  fields = fields or QUESTION_FIELDS
+  columns = [getattr(Question, field) for field in fields]
 
-from models import setup_db, Question, Category
+  return selection.with_entities(*columns), fields
 
-QUESTIONS_PER_PAGE = 10
+# utility for finding where the requested page starts
+def get_page_start(request):
+  '''
+  Returns the offset of the page argument, or None for pages below 1.
+  '''
+  page = request.args.get('page', 1, type=int)
+  if (page < 1):
+    return None
+
+  return (page - 1) * QUESTIONS_PER_PAGE
 
 # utility for paginating questions
 def paginate_questions(request, selection):
-  page = request.args.get('page', 1, type=int)
-  start = (page - 1) * QUESTIONS_PER_PAGE
-  end = start + QUESTIONS_PER_PAGE
+  '''
+  Formats the requested page of a question query ordered by id.
+  With a cursor or after_id the page is found by seeking on questions.id,
+  otherwise LIMIT/OFFSET are applied in SQL for the page argument.
+  Either way only the rows of that page are loaded.
+  '''
+  after_id = get_after_id(request.args)
+  if (after_id is not None):
+    selection = selection.filter(Question.id > after_id)
+    start = 0
+  else:
+    start = get_page_start(request)
+    if (start is None):
+      return []
+
+  selection, fields = select_columns(selection, get_fields(request.args))
+  rows = selection.limit(QUESTIONS_PER_PAGE).offset(start)
+  current_questions = serialization.rows_to_objects(fields, rows)
+
+  return current_questions
 
-  questions = [question.format() for question in selection]
-  current_questions = questions[start:end]
+# utility for paginating questions along with their matched count
+def paginate_counted_questions(request, selection):
+  '''
+  Like paginate_questions, but also returns how many rows the query matches.
+  For page requests the count comes from a count(*) OVER () window in the
+  same statement. Cursor requests need a separate count, because the window
+  would only see the rows after the cursor.
+  '''
+  total = None
+  after_id = get_after_id(request.args)
+  if (after_id is not None):
+    total = selection.with_entities(func.count(Question.id)) \
+        .order_by(None).scalar()
+    selection = selection.filter(Question.id > after_id)
+    start = 0
+  else:
+    start = get_page_start(request)
+    if (start is None):
+      return [], 0
+
+  selection, fields = select_columns(selection, get_fields(request.args))
+  rows = selection.add_columns(func.count(Question.id).over()) \
+      .limit(QUESTIONS_PER_PAGE).offset(start).all()
+  # zipping with the field names leaves out the trailing count
+  current_questions = serialization.rows_to_objects(fields, rows)
+
+  if (total is None):
+    total = rows[0][-1] if rows else 0
+
+  return current_questions, total
+
+# utility for paginating a sorted list of question ids
+def paginate_question_ids(request, ids):
+  '''
+  Formats the requested page of a sorted list of question ids.
+  The page is cut from the list by cursor or page argument,
+  and only its questions are loaded from the database.
+  '''
+  after_id = get_after_id(request.args)
+  if (after_id is not None):
+    start = bisect.bisect_right(ids, after_id)
+  else:
+    start = get_page_start(request)
+    if (start is None):
+      return []
+
+  page_ids = ids[start:start + QUESTIONS_PER_PAGE]
+  if (len(page_ids) == 0):
+    return []
+
+  selection, fields = select_columns(
+      Question.query.filter(Question.id.in_(page_ids)).order_by(Question.id),
+      get_fields(request.args))
+  current_questions = serialization.rows_to_objects(fields, selection)
 
   return current_questions
 
+# utility for answering search requests
+def search_questions(request, body):
+  '''
+  Runs the search described by a request body and returns the page of results
+  with the number of questions matching the search as total_questions.
+  Ranked modes order by relevance, so they only support page= pagination.
+  '''
+  search_term = body.get('searchTerm')
+  mode = body.get('mode', search.DEFAULT_MODE)
+
+  # abort 400 for non-text terms, unknown modes and cursors on ranked results
+  if ((not isinstance(search_term, str)) or (mode not in search.SEARCH_MODES)):
+    abort(400)
+  ranked = mode in search.RANKED_MODES
+  if (ranked and get_after_id(request.args) is not None):
+    abort(400)
+
+  if (mode in search.INDEX_MODES):
+    # look up the matching ids in the inverted index, load only the page
+    if (mode == 'fuzzy'):
+      ids = search_index.fuzzy_search(search_term)
+    else:
+      ids = search_index.search(search_term)
+    paginated = paginate_question_ids(request, ids)
+    total = len(ids)
+  else:
+    # query the database using search term
+    selection = search.search_selection(
+        search_term, mode, bool(body.get('include_answers')))
+
+    # paginate the results, counting the matches in the same statement
+    paginated, total = paginate_counted_questions(request, selection)
+
+  # 404 if no results found
+  if (len(paginated) == 0):
+    abort(404)
+
+  # return results
+  return json_response({
+      'success': True,
+      'questions': paginated,
+      'total_questions': total,
+      'next_cursor': None if ranked else next_cursor(paginated)
+  })
+
+# remember writes, so the client reads them back from the primary
+@on_write
+def stick_to_primary(model, action, instance):
+  if (has_request_context()):
+    g.wrote_primary = True
+
 def create_app(test_config=None):
   # create and configure the app
   app = Flask(__name__)
+  if test_config is not None:
+    app.config.from_mapping(test_config)
+  # old clients expect the refreshed page back from writes
+  app.config.setdefault('MUTATION_RESPONSE', 'representation')
   setup_db(app)
+  bulk.init_app(app)
+  cache.init_app(app)
+  compression.init_app(app)
+  quiz.init_app(app)
+  search.init_app(app)
+  search_index.init_app(app)
+  serialization.init_app(app)
   
   '''
   @TODO: Set up CORS. Allow '*' for origins. Delete the sample route after completing the TODOs
@@ -37,9 +247,75 @@ def create_app(test_config=None):
     '''
     Sets access control.
     '''
-    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization,true')
-    response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
-    return response
+    response.headers.add('Access-Control-Allow-Headers', CORS_ALLOW_HEADERS)
+    response.headers.add('Access-Control-Allow-Methods', CORS_ALLOW_METHODS)
+
+    # attach the validators checked by check_conditional_get
+    if ('etag' in g and response.status_code == 200):
+      response.set_etag(g.etag, weak=True)
+      response.last_modified = g.last_modified
+      response.headers['Cache-Control'] = 'no-cache'
+
+    # answer a client that wrote in full until every worker's validators
+    # have rolled over
+    if (g.get('wrote_primary')):
+      response.set_cookie(WROTE_COOKIE, '1',
+                          max_age=app.config['DATA_VERSION_TTL'], httponly=True)
+
+    # keep a client that wrote off the replica until it has caught up
+    if (g.get('wrote_primary') and 'trivia_replica' in app.extensions):
+      sticky_seconds = get_setting(app.config, 'DB_REPLICA_STICKY_SECONDS',
+                                   DB_REPLICA_STICKY_SECONDS, int)
+      response.set_cookie(PRIMARY_COOKIE, '1', max_age=sticky_seconds,
+                          httponly=True)
+
+    # compress last, once the body and validators are final
+    return compression.compress_response(response)
+
+  @app.before_request
+  def route_reads():
+    '''
+    Lets read-only requests read from the replica, unless the client
+    wrote recently and must see its own writes on the primary.
+    '''
+    g.read_replica = (
+        (request.method in ('GET', 'HEAD')
+         or request.endpoint in REPLICA_ENDPOINTS)
+        and PRIMARY_COOKIE not in request.cookies)
+
+  @app.before_request
+  def check_conditional_get():
+    '''
+    Answers conditional GETs of unchanged data with 304 Not Modified
+    before the handler runs, so no query is made. Clients that wrote
+    recently always get a full response without validators, since their
+    write may have gone to another worker.
+    '''
+    if ((request.method != 'GET')
+            or (request.endpoint not in CONDITIONAL_ENDPOINTS)
+            or (WROTE_COOKIE in request.cookies)):
+      return None
+
+    g.etag, g.last_modified = cache.get_validators()
+
+    since = request.if_modified_since
+    if (since is not None and since.tzinfo is None):
+      # older Werkzeug parses the header into a naive UTC datetime
+      since = since.replace(tzinfo=timezone.utc)
+
+    if (request.if_none_match):
+      not_modified = request.if_none_match.contains_weak(g.etag)
+    else:
+      not_modified = (since is not None and since >= g.last_modified)
+
+    if (not_modified):
+      response = Response(status=304)
+      response.set_etag(g.etag, weak=True)
+      response.last_modified = g.last_modified
+      response.headers['Cache-Control'] = 'no-cache'
+      return response
+
+    return None
 
   '''
   @TODO: 
@@ -52,18 +328,15 @@ def create_app(test_config=None):
     Handles GET requests for getting all categories.
     '''
 
-    # get all categories and add to dict
-    categories = Category.query.all()
-    categories_dict = {}
-    for category in categories:
-        categories_dict[category.id] = category.type
+    # get all categories from the cache
+    categories_dict = cache.get_categories()
 
     # abort 404 if no categories found
     if (len(categories_dict) == 0):
         abort(404)
 
     # return data to view
-    return jsonify({
+    return json_response({
         'success': True,
         'categories': categories_dict
     })
@@ -88,26 +361,43 @@ def create_app(test_config=None):
       '''
 
       # get all questions and paginate
-      selection = Question.query.order_by(Question.id).all()
-      total_questions = len(selection)
+      selection = Question.query.order_by(Question.id)
       current_questions = paginate_questions(request, selection)
+      total_questions = cache.get_question_count()
 
-      # get all categories and add to dict
-      categories = Category.query.all()
-      categories_dict = {}
-      for category in categories:
-          categories_dict[category.id] = category.type
+      # get all categories from the cache
+      categories_dict = cache.get_categories()
 
       # abort 404 if no questions
       if (len(current_questions) == 0):
           abort(404)
 
       # return data to view
-      return jsonify({
+      return json_response({
           'success': True,
           'questions': current_questions,
           'total_questions': total_questions,
-          'categories': categories_dict
+          'categories': categories_dict,
+          'next_cursor': next_cursor(current_questions)
+      })
+
+  @app.route('/questions/<int:question_id>')
+  def get_question(question_id):
+      '''
+      Handles GET requests for a single question, e.g. to fetch
+      an answer left out of a list by the fields argument.
+      '''
+      fields = get_fields(request.args)
+      question = select_fields(Question.query, fields) \
+          .filter(Question.id == question_id).one_or_none()
+
+      # abort 404 if no question found
+      if (question is None):
+          abort(404)
+
+      return json_response({
+          'success': True,
+          'question': question.format(fields)
       })
 
   '''
@@ -119,28 +409,35 @@ def create_app(test_config=None):
   '''
   @app.route("/questions/<int:question_id>", methods=['DELETE'])
   def delete_question(question_id):
-        try:
-            question = Question.query.filter(Question.id == question_id).one_or_none()
+        minimal = wants_minimal_response(request)
+        question = Question.query.filter(Question.id == question_id).one_or_none()
 
-            if question is None:
-                abort(404)
+        # abort 422 if there is no question to delete
+        if question is None:
+            abort(422)
 
+        try:
             question.delete()
-            selection = Question.query.order_by(Question.id).all()
-            current_questions = paginate_questions(request, selection)
-
-            return jsonify(
-                {
-                    "success": True,
-                    "deleted": question_id,
-                    "questions": current_questions,
-                    "total_questions": len(Question.query.all()),
-                }
-            )
-
         except Exception as e:
-            # abort(422)
+            db.session.rollback()
             print("Error in delete question:" + str(e))
+            abort(422)
+
+        # the page refresh is left to the cached GET path
+        if (minimal):
+            return json_response({"success": True, "deleted": question_id})
+
+        selection = Question.query.order_by(Question.id)
+        current_questions = paginate_questions(request, selection)
+
+        return json_response(
+            {
+                "success": True,
+                "deleted": question_id,
+                "questions": current_questions,
+                "total_questions": cache.get_question_count(),
+            }
+        )
 
 #   @app.route('/questions/<int:question_id>', methods=['DELETE'])
 #   def delete_question(question_id):
@@ -191,25 +488,7 @@ def create_app(test_config=None):
 
     # if search term is present
     if (body.get('searchTerm')):
-      search_term = body.get('searchTerm')
-
-      # query the database using search term
-      selection = Question.query.filter(
-          Question.question.ilike(f'%{search_term}%')).all()
-
-      # 404 if no results found
-      if (len(selection) == 0):
-          abort(404)
-
-      # paginate the results
-      paginated = paginate_questions(request, selection)
-
-      # return results
-      return jsonify({
-          'success': True,
-          'questions': paginated,
-          'total_questions': len(Question.query.all())
-      })
+      return search_questions(request, body)
     # if no search term, create new question
     else:
         # load data from body
@@ -222,7 +501,8 @@ def create_app(test_config=None):
         if ((new_question is None) or (new_answer is None)
                 or (new_difficulty is None) or (new_category is None)):
             abort(422)
-            
+
+        minimal = wants_minimal_response(request)
         try:
 
             question = Question(
@@ -233,22 +513,121 @@ def create_app(test_config=None):
 
             question.insert()
 
-            # get all questions and paginate
-            selection = Question.query.order_by(Question.id).all()
-            current_questions = paginate_questions(request, selection)
-            # flash('question was successfully created!')
-
-            # return data to view
-            return jsonify({
-                'success': True,
-                'created': question.id,
-                'question_created': question.question,
-                'questions': current_questions,
-                'total_questions': len(Question.query.all())
-            })
-
         except Exception as e:
+            db.session.rollback()
             print('Error message: ' + str(e))
+            abort(422)
+
+        # the page refresh is left to the cached GET path
+        if (minimal):
+            return json_response({'success': True, 'created': question.id})
+
+        # get all questions and paginate
+        selection = Question.query.order_by(Question.id)
+        current_questions = paginate_questions(request, selection)
+        # flash('question was successfully created!')
+
+        # return data to view
+        return json_response({
+            'success': True,
+            'created': question.id,
+            'question_created': question.question,
+            'questions': current_questions,
+            'total_questions': cache.get_question_count()
+        })
+
+  @app.route('/questions', methods=['DELETE'])
+  def delete_questions():
+    '''
+    Handles DELETE requests removing the questions matching the ids and/or
+    category in the body, in one statement. Returns how many were deleted.
+    '''
+    body = request.get_json(silent=True) or {}
+    criteria = bulk.get_bulk_criteria(body)
+
+    try:
+      deleted = bulk.delete_questions(criteria)
+    except Exception as e:
+      db.session.rollback()
+      print('Error in delete questions: ' + str(e))
+      abort(422)
+
+    return json_response({
+        'success': True,
+        'deleted': deleted
+    })
+
+  @app.route('/questions', methods=['PATCH'])
+  def update_questions():
+    '''
+    Handles PATCH requests setting the category and/or difficulty given in
+    values on the questions matching the ids and/or category in the body,
+    in one statement. Returns how many were updated.
+    '''
+    body = request.get_json(silent=True) or {}
+    criteria = bulk.get_bulk_criteria(body)
+    values = bulk.get_bulk_values(body)
+
+    try:
+      updated = bulk.update_questions(criteria, values)
+    except Exception as e:
+      db.session.rollback()
+      print('Error in update questions: ' + str(e))
+      abort(422)
+
+    return json_response({
+        'success': True,
+        'updated': updated
+    })
+
+  @app.route('/questions/import', methods=['POST'])
+  def import_questions():
+    '''
+    Handles POST requests importing a stream of NDJSON or CSV questions,
+    read by the format argument or the content type. The whole body is
+    imported in one transaction, or nothing if a line is invalid.
+    '''
+    import_format = (request.args.get('format')
+                     or bulk.IMPORT_MIMETYPES.get(request.mimetype))
+    if (import_format not in bulk.IMPORT_FORMATS):
+      abort(400)
+
+    try:
+      imported = bulk.import_questions(
+          bulk.read_records(request.stream, import_format))
+    except bulk.ImportRowError as e:
+      return json_response({
+          'success': False,
+          'error': 422,
+          'message': e.message,
+          'line': e.line
+      }, 422)
+    except Exception as e:
+      print('Error in import questions: ' + str(e))
+      abort(422)
+
+    return json_response({
+        'success': True,
+        'imported': imported
+    })
+
+  @app.route('/questions/export')
+  def export_questions():
+    '''
+    Handles GET requests exporting all questions as NDJSON (the default)
+    or CSV. Rows are streamed as they are read, so the export starts at
+    once and its size doesn't grow the memory used.
+    '''
+    export_format = request.args.get('format', 'ndjson')
+    if (export_format not in bulk.EXPORT_MIMETYPES):
+      abort(400)
+
+    response = Response(
+        stream_with_context(bulk.export_questions(export_format)),
+        mimetype=bulk.EXPORT_MIMETYPES[export_format])
+    response.headers['Content-Disposition'] = \
+        'attachment; filename=questions.' + export_format
+    return response
 
   '''
   @TODO: 
@@ -270,26 +649,29 @@ def create_app(test_config=None):
 
     # if search term is present
     if (body.get('searchTerm')):
-      search_term = body.get('searchTerm')
+      return search_questions(request, body)
 
-      # query the database using search term
-      selection = Question.query.filter(
-          Question.question.ilike(f'%{search_term}%')).all()
+    # abort 400 without search term
+    abort(400)
 
-      # 404 if no results found
-      if (len(selection) == 0):
-          abort(404)
+  @app.route('/questions/suggest')
+  def suggest_search_terms():
+    '''
+    Handles GET requests for completing a partly typed search term.
+    Completions come from the in-memory search index, not the database.
+    '''
+    prefix = request.args.get('prefix', '').strip()
+    limit = request.args.get('limit', search_index.SUGGEST_LIMIT, type=int)
 
-      # paginate the results
-      paginated = paginate_questions(request, selection)
+    # abort 400 without prefix or with a limit out of range
+    if ((len(prefix) == 0) or (limit < 1)
+            or (limit > search_index.SUGGEST_MAX_LIMIT)):
+      abort(400)
 
-      # return results
-      return jsonify({
-          'success': True,
-          'questions': paginated,
-          'total_questions': len(Question.query.all())
-      })
-    
+    return json_response({
+        'success': True,
+        'suggestions': search_index.suggest(prefix, limit)
+    })
 
   '''
   @TODO: 
@@ -305,25 +687,27 @@ def create_app(test_config=None):
       Handles GET requests for getting questions based on category.
       '''
 
-      # get the category by id
-      category = Category.query.filter_by(id=id).one_or_none()
+      # get the category type by id
+      category_type = cache.get_categories().get(id)
 
       # abort 400 for bad request if category isn't found
-      if (category is None):
+      if (category_type is None):
           abort(400)
 
       # get the matching questions
-      selection = Question.query.filter_by(category=category.id).all()
+      selection = Question.query.filter_by(
+          category=id).order_by(Question.id)
 
       # paginate the selection
       paginated = paginate_questions(request, selection)
 
       # return the results
-      return jsonify({
+      return json_response({
           'success': True,
           'questions': paginated,
-          'total_questions': len(Question.query.all()),
-          'current_category': category.type
+          'total_questions': cache.get_question_count(id),
+          'current_category': category_type,
+          'next_cursor': next_cursor(paginated)
       })
 
 
@@ -342,6 +726,7 @@ def create_app(test_config=None):
   def get_random_quiz_question():
       '''
       Handles POST requests for playing quiz.
+      With a count, a whole round of distinct questions is returned at once.
       '''
 
       # load the request body
@@ -353,53 +738,126 @@ def create_app(test_config=None):
       # get the category
       category = body.get('quiz_category')
 
-      # abort 400 if category or previous questions isn't found
-      if ((category is None) or (previous is None)):
+      # abort 400 if category or previous questions isn't valid
+      category_id = quiz.get_category_id(category)
+      if ((category_id is None) or (not quiz.is_id_list(previous))):
           abort(400)
 
-      # load questions all questions if "ALL" is selected
-      if (category['id'] == 0):
-          questions = Question.query.all()
-      # load questions for given category
-      else:
-          questions = Question.query.filter_by(category=category['id']).all()
+      # pick a whole round of unused questions if a count is given
+      count = body.get('count')
+      if (count is not None):
+          if ((not isinstance(count, int)) or isinstance(count, bool)
+                  or (count < 1) or (count > quiz.QUIZ_MAX_COUNT)):
+              abort(400)
 
-      # get total number of questions
-      total = len(questions)
+          questions = quiz.pick_random_questions(category_id, previous, count)
 
-      # picks a random question
-      def get_random_question():
-          return questions[random.randrange(0, len(questions), 1)]
+          return json_response({
+              'success': True,
+              'questions': [question.format() for question in questions]
+          })
 
-      # checks to see if question has already been used
-      def check_if_used(question):
-          used = False
-          for q in previous:
-              if (q == question.id):
-                  used = True
+      # pick a random question that hasn't been used yet
+      question = quiz.pick_random_question(category_id, previous)
 
-          return used
+      # return without question once all questions have been used
+      # necessary if category has <5 questions
+      if (question is None):
+          return json_response({
+              'success': True
+          })
 
-      # get random question
-      question = get_random_question()
+      # return the question
+      return json_response({
+          'success': True,
+          'question': question.format()
+      })
 
-      # check if used, execute until unused question found
-      while (check_if_used(question)):
-          question = get_random_question()
+  @app.route('/quizzes/sessions', methods=['POST'])
+  def start_quiz_session():
+      '''
+      Handles POST requests for starting a quiz session.
+      The server shuffles the category's questions once and
+      serves them one by one from /quizzes/sessions/<session_id>/next.
+      Decks live in this process's memory, so sessions are opt-in for
+      deployments that pin a client to one worker; the bundled client
+      plays through the stateless /quizzes endpoint.
+      '''
 
-          # if all questions have been tried, return without question
-          # necessary if category has <5 questions
-          if (len(previous) == total):
-              return jsonify({
-                  'success': True
-              })
+      # load the request body
+      body = request.get_json() or {}
 
-      # return the question
-      return jsonify({
+      # abort 400 if category isn't valid
+      category_id = quiz.get_category_id(body.get('quiz_category'))
+      if (category_id is None):
+          abort(400)
+
+      # shuffle the deck for the new session
+      session_id, total = quiz.start_session(category_id)
+
+      return json_response({
+          'success': True,
+          'session_id': session_id,
+          'total_questions': total
+      })
+
+  @app.route('/quizzes/sessions/<session_id>/next', methods=['POST'])
+  def next_quiz_question(session_id):
+      '''
+      Handles POST requests for the next question of a quiz session.
+      '''
+
+      # abort 404 if the session doesn't exist or expired
+      try:
+          question = quiz.next_question(session_id)
+      except KeyError:
+          abort(404)
+
+      # return without question once the deck is empty
+      if (question is None):
+          return json_response({
+              'success': True
+          })
+
+      return json_response({
           'success': True,
           'question': question.format()
       })
 
+  @app.route('/quizzes/sessions/<session_id>', methods=['DELETE'])
+  def finish_quiz_session(session_id):
+      '''
+      Handles DELETE requests for finishing a quiz session.
+      '''
+
+      # abort 404 if the session doesn't exist or expired
+      try:
+          served = quiz.get_sessions().finish(session_id)
+      except KeyError:
+          abort(404)
+
+      return json_response({
+          'success': True,
+          'finished': session_id,
+          'questions_served': served
+      })
+
+  @app.route('/metrics/pool')
+  def get_pool_metrics():
+    '''
+    Handles GET requests for the connection pool counters of this process,
+    and of its replica pool when there is one.
+    '''
+    metrics = {
+        'success': True,
+        'pool': watch_pool(db.engine).snapshot()
+    }
+    replica = app.extensions.get('trivia_replica')
+    if (replica is not None):
+      metrics['replica_pool'] = watch_pool(replica.engine).snapshot()
+      metrics['replica_healthy'] = replica.healthy
+    return json_response(metrics)
+
   '''
   @TODO: 
   Create error handlers for all expected errors 
@@ -408,27 +866,27 @@ def create_app(test_config=None):
   #___________ERROR HANDLER_______
   @app.errorhandler(404)
   def not_found(error):
-    return jsonify({
+    return json_response({
         "success": False,
         "error": 404,
         "message": "resource not found"
-    }), 404
+    }, 404)
 
   @app.errorhandler(422)
   def unprocessable(error):
-      return jsonify({
+      return json_response({
           "success": False,
           "error": 422,
           "message": "unprocessable"
-      }), 422
+      }, 422)
 
   @app.errorhandler(400)
   def bad_request(error):
-      return jsonify({
+      return json_response({
           "success": False,
           "error": 400,
           "message": "bad request"
-      }), 400
+      }, 400)
 
   
   return app
@@ -0,0 +1,344 @@
+import csv
+import io
+import json
+import os
+
+import click
+from flask import current_app, abort
+from flask.cli import with_appcontext
+
+from models import db, Question, notify_write
+from . import cache, serialization
+
+IMPORT_BATCH_SIZE = 5000
+IMPORT_FIELDS = ('question', 'answer', 'category', 'difficulty')
+IMPORT_FORMATS = ('ndjson', 'csv')
+# content types of import bodies and the formats they are read as
+IMPORT_MIMETYPES = {
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+    'text/csv': 'csv'
+}
+
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FIELDS = ('id',) + IMPORT_FIELDS
+# formats questions are exported in and their content types
+EXPORT_MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+# fields a bulk update may set
+BULK_UPDATE_FIELDS = ('category', 'difficulty')
+
+COPY_QUESTIONS = ('COPY questions (question, answer, category, difficulty) '
+                  'FROM STDIN WITH (FORMAT csv)')
+
+class ImportRowError(ValueError):
+  '''
+  Raised for a line of an import that can't be read or validated.
+  '''
+
+  def __init__(self, line, message):
+    super().__init__('line {}: {}'.format(line, message))
+    self.line = line
+    self.message = message
+
+def decode_lines(stream):
+  '''
+  Decodes the lines of a binary stream as UTF-8.
+  '''
+  for number, line in enumerate(stream, 1):
+    try:
+      yield line.decode('utf-8')
+    except UnicodeDecodeError:
+      raise ImportRowError(number, 'invalid UTF-8')
+
+def read_ndjson(lines):
+  '''
+  Yields (line number, record) for each non-blank line of JSON objects.
+  '''
+  for number, line in enumerate(lines, 1):
+    if (not line.strip()):
+      continue
+    try:
+      record = json.loads(line)
+    except ValueError:
+      raise ImportRowError(number, 'invalid JSON')
+    if (not isinstance(record, dict)):
+      raise ImportRowError(number, 'expected a JSON object')
+    yield number, record
+
+def read_csv(lines):
+  '''
+  Yields (line number, record) for each row of CSV with a header row
+  naming the question fields.
+  '''
+  reader = csv.DictReader(lines)
+  if (reader.fieldnames is None
+          or any(field not in reader.fieldnames for field in IMPORT_FIELDS)):
+    raise ImportRowError(1, 'header must name ' + ', '.join(IMPORT_FIELDS))
+  for record in reader:
+    yield reader.line_num, record
+
+READERS = {
+    'ndjson': read_ndjson,
+    'csv': read_csv
+}
+
+def read_records(stream, import_format):
+  '''
+  Yields (line number, record) for each question in a binary stream.
+  '''
+  return READERS[import_format](decode_lines(stream))
+
+def validate_record(number, record, category_ids):
+  '''
+  Returns the column values of a question record, or raises
+  ImportRowError if a field is missing or invalid.
+  '''
+  for field in ('question', 'answer'):
+    text = record.get(field)
+    if (not isinstance(text, str) or not text.strip()):
+      raise ImportRowError(number, field + ' must be non-empty text')
+
+  try:
+    category = int(record.get('category'))
+    difficulty = int(record.get('difficulty'))
+  except (TypeError, ValueError):
+    raise ImportRowError(number, 'category and difficulty must be integers')
+
+  if (category not in category_ids):
+    raise ImportRowError(number, 'unknown category {}'.format(category))
+
+  return {
+      'question': record['question'],
+      'answer': record['answer'],
+      'category': category,
+      'difficulty': difficulty
+  }
+
+def batches(rows, size):
+  '''
+  Groups rows into lists of at most size rows.
+  '''
+  batch = []
+  for row in rows:
+    batch.append(row)
+    if (len(batch) == size):
+      yield batch
+      batch = []
+  if (batch):
+    yield batch
+
+def copy_batch(cursor, batch):
+  '''
+  Loads a batch of rows into the questions table with COPY.
+  '''
+  buffer = io.StringIO()
+  writer = csv.writer(buffer)
+  for row in batch:
+    writer.writerow([row[field] for field in IMPORT_FIELDS])
+  buffer.seek(0)
+  cursor.copy_expert(COPY_QUESTIONS, buffer)
+
+def import_questions(records, batch_size=None):
+  '''
+  Validates and inserts (line number, record) pairs batch by batch in a
+  single transaction, so an invalid line imports nothing. Postgres loads
+  each batch with COPY, other databases with one executemany insert.
+  Returns the number of questions imported.
+  '''
+  batch_size = batch_size or current_app.config['IMPORT_BATCH_SIZE']
+  category_ids = set(cache.get_categories())
+  rows = (validate_record(number, record, category_ids)
+          for number, record in records)
+
+  imported = 0
+  engine = db.engine
+  if (engine.dialect.name == 'postgresql'):
+    connection = engine.raw_connection()
+    try:
+      cursor = connection.cursor()
+      for batch in batches(rows, batch_size):
+        copy_batch(cursor, batch)
+        imported += len(batch)
+      connection.commit()
+    finally:
+      # drop the loaded batches if a later one failed
+      connection.rollback()
+      connection.close()
+  else:
+    with engine.begin() as connection:
+      for batch in batches(rows, batch_size):
+        connection.execute(Question.__table__.insert(), batch)
+        imported += len(batch)
+
+  if (imported):
+    notify_write(Question, 'bulk')
+  return imported
+
+def format_for_path(path):
+  '''
+  Guesses the format of a file from its extension.
+  '''
+  return 'csv' if os.path.splitext(path)[1].lower() == '.csv' else 'ndjson'
+
+@click.command('import-questions')
+@click.argument('source', type=click.File('rb'))
+@click.option('--format', 'import_format', type=click.Choice(IMPORT_FORMATS),
+              help='Format of the file, guessed from its extension if not given.')
+@click.option('--batch-size', type=int, default=None,
+              help='Rows validated and loaded per batch.')
+@with_appcontext
+def import_questions_command(source, import_format, batch_size):
+  '''
+  Imports questions from an NDJSON or CSV file, or - for stdin.
+  '''
+  import_format = import_format or format_for_path(source.name)
+  try:
+    imported = import_questions(read_records(source, import_format),
+                                batch_size)
+  except ImportRowError as e:
+    raise click.ClickException(str(e))
+  click.echo('Imported {} questions'.format(imported))
+
+def export_rows():
+  '''
+  Yields batches of question row tuples in id order. The rows are read
+  through a server-side cursor EXPORT_BATCH_SIZE at a time, so the
+  table is never held in memory.
+  '''
+  columns = [getattr(Question, field) for field in EXPORT_FIELDS]
+  rows = db.session.query(*columns).order_by(Question.id) \
+      .yield_per(current_app.config['EXPORT_BATCH_SIZE'])
+  return batches(rows, current_app.config['EXPORT_BATCH_SIZE'])
+
+def write_ndjson(row_batches):
+  '''
+  Yields the bytes of each batch of rows as lines of JSON objects.
+  '''
+  for batch in row_batches:
+    yield b''.join(serialization.dumps(dict(zip(EXPORT_FIELDS, row))) + b'\n'
+                   for row in batch)
+
+def write_csv(row_batches):
+  '''
+  Yields the bytes of a header row, then of each batch of rows, as CSV.
+  '''
+  buffer = io.StringIO()
+  writer = csv.writer(buffer)
+  writer.writerow(EXPORT_FIELDS)
+  for batch in row_batches:
+    writer.writerows(batch)
+    yield buffer.getvalue().encode('utf-8')
+    buffer.seek(0)
+    buffer.truncate()
+
+  # the header alone when there are no questions
+  if (buffer.tell()):
+    yield buffer.getvalue().encode('utf-8')
+
+WRITERS = {
+    'ndjson': write_ndjson,
+    'csv': write_csv
+}
+
+def export_questions(export_format):
+  '''
+  Yields the question bank as chunks of NDJSON or CSV bytes.
+  '''
+  return WRITERS[export_format](export_rows())
+
+@click.command('export-questions')
+@click.argument('destination', type=click.File('wb'), default='-')
+@click.option('--format', 'export_format', type=click.Choice(IMPORT_FORMATS),
+              help='Format to write, guessed from the file extension if not given.')
+@with_appcontext
+def export_questions_command(destination, export_format):
+  '''
+  Exports all questions as NDJSON or CSV to a file, or stdout by default.
+  '''
+  export_format = export_format or format_for_path(destination.name)
+  for chunk in export_questions(export_format):
+    destination.write(chunk)
+
+def is_integer(value):
+  return isinstance(value, int) and not isinstance(value, bool)
+
+def get_bulk_criteria(body):
+  '''
+  Returns the criteria selecting the questions of a bulk write from the
+  ids and category of a request body. Aborts with 400 if they are
+  malformed or if neither is given, so a bulk write can't touch every
+  question by mistake.
+  '''
+  criteria = []
+
+  ids = body.get('ids')
+  if (ids is not None):
+    if (not isinstance(ids, list) or not ids
+            or not all(is_integer(question_id) for question_id in ids)):
+      abort(400)
+    criteria.append(Question.id.in_(ids))
+
+  category = body.get('category')
+  if (category is not None):
+    if (not is_integer(category)):
+      abort(400)
+    criteria.append(Question.category == category)
+
+  if (not criteria):
+    abort(400)
+  return criteria
+
+def get_bulk_values(body):
+  '''
+  Returns the field -> value changes of a bulk update. Aborts with 400 for
+  fields that can't be set in bulk or non-integer values, and with 422
+  for an unknown category.
+  '''
+  values = body.get('values')
+  if (not isinstance(values, dict) or not values
+          or any(field not in BULK_UPDATE_FIELDS for field in values)
+          or not all(is_integer(value) for value in values.values())):
+    abort(400)
+
+  if ('category' in values and values['category'] not in cache.get_categories()):
+    abort(422)
+  return values
+
+def delete_questions(criteria):
+  '''
+  Deletes the matching questions with a single DELETE statement and
+  returns how many were deleted.
+  '''
+  deleted = Question.query.filter(*criteria).delete(synchronize_session=False)
+  db.session.commit()
+
+  if (deleted):
+    notify_write(Question, 'bulk')
+  return deleted
+
+def update_questions(criteria, values):
+  '''
+  Applies the changes to the matching questions with a single UPDATE
+  statement and returns how many were updated.
+  '''
+  updated = Question.query.filter(*criteria) \
+      .update(values, synchronize_session=False)
+  db.session.commit()
+
+  if (updated):
+    notify_write(Question, 'bulk')
+  return updated
+
+def init_app(app):
+  '''
+  Sets the import and export batch sizes and adds the import-questions
+  and export-questions commands.
+  '''
+  app.config.setdefault('IMPORT_BATCH_SIZE', IMPORT_BATCH_SIZE)
+  app.config.setdefault('EXPORT_BATCH_SIZE', EXPORT_BATCH_SIZE)
+  app.cli.add_command(import_questions_command)
+  app.cli.add_command(export_questions_command)
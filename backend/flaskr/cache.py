@@ -0,0 +1,182 @@
+import secrets
+import threading
+import time
+from datetime import datetime, timezone
+from flask import current_app, has_app_context
+from sqlalchemy import func
+
+from api_common import CATEGORY_CACHE_TTL, QUESTION_COUNT_TTL
+from models import db, Question, Category, on_write
+
+DATA_VERSION_TTL = 60
+
+class CachedValue:
+  '''
+  Holds the result of a loader until it is invalidated or older than ttl seconds.
+  '''
+
+  def __init__(self, loader, ttl):
+    self.loader = loader
+    self.ttl = ttl
+    self._value = None
+    self._loaded_at = 0
+    self._lock = threading.Lock()
+
+  def get(self):
+    with self._lock:
+      expired = time.monotonic() - self._loaded_at > self.ttl
+      if (self._value is None or expired):
+        self._value = self.loader()
+        self._loaded_at = time.monotonic()
+      return self._value
+
+  def invalidate(self):
+    with self._lock:
+      self._value = None
+
+class QuestionCounter:
+  '''
+  Keeps the number of questions per category.
+  Counts are loaded with one grouped count(*) and then adjusted as questions
+  are inserted and deleted. They are reloaded after ttl seconds, which bounds
+  the drift from writes made by other processes.
+  '''
+
+  def __init__(self, ttl):
+    self.ttl = ttl
+    self._counts = None
+    self._loaded_at = 0
+    self._lock = threading.Lock()
+
+  def _load(self):
+    rows = db.session.query(Question.category, func.count(Question.id)) \
+        .group_by(Question.category)
+    self._counts = {str(category): count for category, count in rows}
+    self._loaded_at = time.monotonic()
+
+  def count(self, category=None):
+    '''
+    Returns the number of questions, optionally only those of one category.
+    '''
+    with self._lock:
+      expired = time.monotonic() - self._loaded_at > self.ttl
+      if (self._counts is None or expired):
+        self._load()
+      if (category is None):
+        return sum(self._counts.values())
+      return self._counts.get(str(category), 0)
+
+  def adjust(self, category, delta):
+    with self._lock:
+      if (self._counts is None):
+        return
+      key = str(category)
+      self._counts[key] = self._counts.get(key, 0) + delta
+
+  def invalidate(self):
+    with self._lock:
+      self._counts = None
+
+class DataVersion:
+  '''
+  Version of the trivia data, bumped on every model write, from which
+  ETag and Last-Modified validators are derived without a database hit.
+  The version only sees this process's writes, so validators also roll
+  over every ttl seconds, bounding how long other workers' writes can
+  go unnoticed. The random token keeps a restarted process from
+  reusing the validators of the previous one; it also makes an ETag
+  match only on the worker that issued it, so behind a load balancer a
+  revalidation landing on another worker gets a full 200 response.
+  A worker can still answer 304 after another worker's write, so clients
+  that wrote are kept off the 304 path for a ttl by a cookie (see
+  check_conditional_get in flaskr/__init__.py).
+  '''
+
+  def __init__(self, ttl):
+    self.ttl = ttl
+    self.token = secrets.token_hex(4)
+    self._version = 0
+    self._modified = time.time()
+    self._lock = threading.Lock()
+
+  def bump(self):
+    with self._lock:
+      self._version += 1
+      self._modified = time.time()
+
+  def validators(self):
+    '''
+    Returns the current (etag, last_modified) pair.
+    '''
+    with self._lock:
+      now = time.time()
+      window_start = now - now % self.ttl
+      etag = '{}-{}-{}'.format(self.token, self._version, int(window_start))
+      modified = max(self._modified, window_start)
+
+    return etag, datetime.fromtimestamp(int(modified), timezone.utc)
+
+def load_categories():
+  '''
+  Builds the id -> type map of all categories.
+  '''
+  return {category.id: category.type
+          for category in Category.query.order_by(Category.id)}
+
+def init_app(app):
+  '''
+  Attaches the reference data caches to the app.
+  '''
+  app.config.setdefault('CATEGORY_CACHE_TTL', CATEGORY_CACHE_TTL)
+  app.config.setdefault('QUESTION_COUNT_TTL', QUESTION_COUNT_TTL)
+  app.config.setdefault('DATA_VERSION_TTL', DATA_VERSION_TTL)
+  app.extensions['trivia_cache'] = {
+      'categories': CachedValue(load_categories,
+                                app.config['CATEGORY_CACHE_TTL']),
+      'question_count': QuestionCounter(app.config['QUESTION_COUNT_TTL']),
+      'data_version': DataVersion(app.config['DATA_VERSION_TTL'])
+  }
+
+def get_cache(name):
+  return current_app.extensions['trivia_cache'][name]
+
+def get_categories():
+  '''
+  Returns the cached id -> type map of categories.
+  The map is shared between requests and must not be modified.
+  '''
+  return get_cache('categories').get()
+
+def invalidate_categories():
+  get_cache('categories').invalidate()
+
+def get_question_count(category=None):
+  '''
+  Returns the maintained number of questions, optionally for one category.
+  '''
+  return get_cache('question_count').count(category)
+
+def get_validators():
+  '''
+  Returns the (etag, last_modified) validators of the current data.
+  '''
+  return get_cache('data_version').validators()
+
+@on_write
+def invalidate_on_write(model, action, instance):
+  if (not has_app_context() or 'trivia_cache' not in current_app.extensions):
+    return
+
+  get_cache('data_version').bump()
+
+  if (model is Category):
+    invalidate_categories()
+  elif (model is Question):
+    counter = get_cache('question_count')
+    if (action == 'insert'):
+      counter.adjust(instance.category, 1)
+    elif (action == 'delete'):
+      counter.adjust(instance.category, -1)
+    else:
+      # the category may have changed, or many rows were written, so recount
+      counter.invalidate()
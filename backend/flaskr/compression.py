@@ -0,0 +1,99 @@
+import gzip
+import threading
+from collections import OrderedDict
+from flask import current_app, request
+
+try:
+  import brotli
+except ImportError:
+  brotli = None
+
+COMPRESS_MIN_SIZE = 500
+COMPRESS_LEVEL = 6
+COMPRESS_CACHE_SIZE = 256
+
+class CompressedCache:
+  '''
+  LRU map of compressed bodies. Only responses carrying an ETag are
+  stored, keyed by path, ETag and encoding, since the ETag changes
+  whenever the data behind the body does.
+  '''
+
+  def __init__(self, size):
+    self.size = size
+    self._bodies = OrderedDict()
+    self._lock = threading.Lock()
+
+  def get(self, key):
+    with self._lock:
+      body = self._bodies.get(key)
+      if (body is not None):
+        self._bodies.move_to_end(key)
+      return body
+
+  def put(self, key, body):
+    with self._lock:
+      self._bodies[key] = body
+      self._bodies.move_to_end(key)
+      while (len(self._bodies) > self.size):
+        self._bodies.popitem(last=False)
+
+def init_app(app):
+  '''
+  Attaches the compressed body cache to the app.
+  '''
+  app.config.setdefault('COMPRESS_MIN_SIZE', COMPRESS_MIN_SIZE)
+  app.config.setdefault('COMPRESS_LEVEL', COMPRESS_LEVEL)
+  app.config.setdefault('COMPRESS_CACHE_SIZE', COMPRESS_CACHE_SIZE)
+  app.extensions['trivia_compressed'] = CompressedCache(
+      app.config['COMPRESS_CACHE_SIZE'])
+
+def choose_encoding():
+  '''
+  Returns the best encoding the client accepts, brotli over gzip,
+  or None if it accepts neither.
+  '''
+  accepted = request.accept_encodings
+  if (brotli is not None and accepted['br']):
+    return 'br'
+  if (accepted['gzip']):
+    return 'gzip'
+  return None
+
+def compress(body, encoding):
+  level = current_app.config['COMPRESS_LEVEL']
+  if (encoding == 'br'):
+    # brotli qualities go up to 11, map the gzip style level onto them
+    return brotli.compress(body, quality=min(11, level + 1))
+  return gzip.compress(body, compresslevel=level)
+
+def compress_response(response):
+  '''
+  Compresses JSON responses of at least COMPRESS_MIN_SIZE bytes for
+  clients that accept gzip or brotli. Bodies of responses with an ETag
+  are served from the compressed cache after the first time.
+  '''
+  if ((response.status_code != 200) or (response.mimetype != 'application/json')
+          or response.direct_passthrough or response.is_streamed
+          or ('Content-Encoding' in response.headers)):
+    return response
+
+  response.vary.add('Accept-Encoding')
+  encoding = choose_encoding()
+  if (encoding is None
+          or response.content_length < current_app.config['COMPRESS_MIN_SIZE']):
+    return response
+
+  etag = response.headers.get('ETag')
+  compressed = current_app.extensions['trivia_compressed']
+  key = (request.full_path, etag, encoding)
+
+  body = compressed.get(key) if etag else None
+  if (body is None):
+    body = compress(response.get_data(), encoding)
+    if (etag):
+      compressed.put(key, body)
+
+  response.set_data(body)
+  response.headers['Content-Encoding'] = encoding
+  return response
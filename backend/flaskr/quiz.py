@@ -0,0 +1,103 @@
+import random
+from flask import current_app
+from sqlalchemy import func
+
+from models import Question
+# shared with the async app, which can't import flask
+from quiz_sessions import (QUIZ_SESSION_TTL, QUIZ_SESSION_LIMIT, QUIZ_DECK_SIZE,
+                           QUIZ_MAX_COUNT, get_category_id, is_id_list,
+                           shuffle_deck, QuizSessionStore)
+
+def eligible_questions(category_id, previous):
+  '''
+  Builds the query of questions in a category (all for 0)
+  that aren't in the previous question ids.
+  The exclusion is done by the database.
+  '''
+  selection = Question.query
+  if (category_id != 0):
+    selection = selection.filter(Question.category == category_id)
+  if (previous):
+    selection = selection.filter(~Question.id.in_(previous))
+
+  return selection
+
+def pick_random_question(category_id, previous):
+  '''
+  Samples one unused question uniformly, or returns None once the category
+  is exhausted. The eligible ids are counted and a random one is picked by
+  offset, both read from the (category, id) index without touching the
+  rows; only the picked question is loaded.
+  '''
+  ids = eligible_questions(category_id, previous) \
+      .with_entities(Question.id).order_by(Question.id)
+
+  # draw again if questions were deleted between the count and the pick
+  for attempt in range(2):
+    total = ids.count()
+    if (total == 0):
+      return None
+
+    picked = ids.offset(random.randrange(total)).limit(1).as_scalar()
+    question = Question.query.filter(Question.id == picked).first()
+    if (question is not None):
+      return question
+
+  return None
+
+def pick_random_questions(category_id, previous, count):
+  '''
+  Samples up to count distinct unused questions for a whole round.
+  The database shuffles only the eligible ids, read from the
+  (category, id) index, and the picked rows are loaded in the same
+  statement.
+  '''
+  picks = eligible_questions(category_id, previous) \
+      .with_entities(Question.id).order_by(func.random()).limit(count) \
+      .subquery()
+  questions = Question.query.filter(Question.id.in_(picks)).all()
+
+  # the rows come back in index order, so shuffle the round again
+  random.shuffle(questions)
+  return questions
+
+def init_app(app):
+  '''
+  Attaches the quiz session store to the app.
+  '''
+  app.config.setdefault('QUIZ_SESSION_TTL', QUIZ_SESSION_TTL)
+  app.config.setdefault('QUIZ_SESSION_LIMIT', QUIZ_SESSION_LIMIT)
+  app.config.setdefault('QUIZ_DECK_SIZE', QUIZ_DECK_SIZE)
+  app.extensions['quiz_sessions'] = QuizSessionStore(
+      app.config['QUIZ_SESSION_TTL'], app.config['QUIZ_SESSION_LIMIT'])
+
+def get_sessions():
+  return current_app.extensions['quiz_sessions']
+
+def start_session(category_id):
+  '''
+  Shuffles the ids of a category once and starts a session over them.
+  Returns the session id and the number of questions in the deck.
+  '''
+  selection = eligible_questions(category_id, None)
+  ids = [question_id for (question_id,) in selection.with_entities(Question.id)]
+  deck = shuffle_deck(ids, current_app.config['QUIZ_DECK_SIZE'])
+
+  return get_sessions().start(deck), len(deck)
+
+def next_question(session_id):
+  '''
+  Returns the next question of a session, or None once its deck is empty.
+  Each draw is a primary key lookup; ids deleted since the shuffle are skipped.
+  Raises KeyError for unknown sessions.
+  '''
+  sessions = get_sessions()
+  while (True):
+    question_id = sessions.draw(session_id)
+    if (question_id is None):
+      return None
+
+    question = Question.query.get(question_id)
+    if (question is not None):
+      sessions.record_served(session_id)
+      return question
@@ -0,0 +1,91 @@
+from sqlalchemy import func, or_
+from sqlalchemy.exc import DBAPIError
+
+from models import db, Question
+
+DEFAULT_MODE = 'substring'
+SEARCH_MODES = ('substring', 'fulltext', 'trigram', 'index', 'fuzzy')
+# modes answered from the in-process inverted indexes instead of SQL
+INDEX_MODES = ('index', 'fuzzy')
+RANKED_MODES = ('fulltext',)
+
+# text search configuration used by the search_vector migration
+TEXT_SEARCH_CONFIG = 'english'
+
+def substring_selection(search_term):
+  '''
+  Questions whose text contains the search term, ordered by id.
+  '''
+  return Question.query.filter(
+      Question.question.ilike(f'%{search_term}%')).order_by(Question.id)
+
+def fulltext_selection(search_term):
+  '''
+  Questions matching the search term through the GIN indexed
+  search_vector column, ordered by rank.
+  '''
+  query = func.plainto_tsquery(TEXT_SEARCH_CONFIG, search_term)
+  rank = func.ts_rank(Question.search_vector, query)
+
+  return Question.query.filter(Question.search_vector.op('@@')(query)) \
+      .order_by(rank.desc(), Question.id)
+
+def trigram_installed(engine):
+  '''
+  Checks whether the pg_trgm extension is installed in the database.
+  '''
+  try:
+    with engine.connect() as connection:
+      installed = connection.execute(
+          "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'").first()
+      return installed is not None
+  except DBAPIError:
+    return False
+
+def init_app(app):
+  '''
+  Attaches the search state to the app. Whether pg_trgm is installed is
+  checked once here, at startup, rather than in the first trigram search.
+  '''
+  with app.app_context():
+    engine = db.get_engine(app)
+    available = trigram_installed(engine)
+    # like setup_db, leave no connection for forked workers to share
+    engine.dispose()
+
+  if (not available):
+    app.logger.warning(
+        'pg_trgm is not installed, trigram searches run without an index')
+  app.extensions['trivia_search'] = {'trigram_available': available}
+
+def escape_like(search_term):
+  '''
+  Escapes LIKE wildcards so the term is matched literally.
+  '''
+  return search_term.replace('\\', '\\\\') \
+      .replace('%', '\\%').replace('_', '\\_')
+
+def trigram_selection(search_term, include_answers=False):
+  '''
+  Questions (and optionally answers) containing the literal search term,
+  ordered by id. With pg_trgm and migrations/0002_questions_trigram.sql
+  applied the match is a GIN index scan, otherwise a sequential scan.
+  '''
+  pattern = f'%{escape_like(search_term)}%'
+
+  condition = Question.question.ilike(pattern, escape='\\')
+  if (include_answers):
+    condition = or_(condition, Question.answer.ilike(pattern, escape='\\'))
+
+  return Question.query.filter(condition).order_by(Question.id)
+
+def search_selection(search_term, mode=DEFAULT_MODE, include_answers=False):
+  '''
+  Builds the query of questions matching a search term in the given mode.
+  '''
+  if (mode == 'fulltext'):
+    return fulltext_selection(search_term)
+  if (mode == 'trigram'):
+    return trigram_selection(search_term, include_answers)
+
+  return substring_selection(search_term)
@@ -0,0 +1,377 @@
+import bisect
+import heapq
+import re
+import threading
+import time
+from flask import current_app, has_app_context
+
+from models import db, Question, on_write
+
+SEARCH_INDEX_TTL = 300
+SUGGEST_LIMIT = 5
+SUGGEST_MAX_LIMIT = 20
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+def tokenize(text):
+  '''
+  Splits text into its set of lower-cased word tokens.
+  '''
+  return set(TOKEN_PATTERN.findall((text or '').lower()))
+
+class InvertedIndex:
+  '''
+  Maps the tokens of question text to the sorted ids of the questions
+  containing them. A search intersects the posting sets of its tokens,
+  smallest first, instead of scanning the questions table.
+  '''
+
+  def __init__(self, fields=('question',)):
+    self.fields = fields
+    self.built_at = None
+    self.stale = False
+    self._lock = threading.RLock()
+    self._build_lock = threading.Lock()
+    self._pending = None
+    self._reset()
+
+  def build(self):
+    '''
+    Rebuilds the index from the questions table.
+    '''
+    with self._build_lock:
+      self._build()
+
+  def _build(self):
+    # the new index is filled without holding the lock, so searches keep
+    # using the current one; writes made in the meantime are recorded and
+    # replayed on the new index when it is swapped in
+    with self._lock:
+      self._pending = []
+
+    try:
+      fresh = type(self)(self.fields)
+      columns = [getattr(Question, field) for field in self.fields]
+      rows = db.session.query(Question.id, *columns) \
+          .order_by(Question.id).yield_per(1000)
+      for question_id, *texts in rows:
+        fresh._add(question_id, texts)
+
+      with self._lock:
+        for question_id, texts in self._pending:
+          fresh._remove(question_id)
+          if (texts is not None):
+            fresh._add(question_id, texts)
+        self._swap(fresh)
+        self.built_at = time.monotonic()
+        self.stale = False
+    finally:
+      with self._lock:
+        self._pending = None
+
+  def ensure_built(self):
+    '''
+    Builds the index unless it was built already.
+    '''
+    with self._build_lock:
+      if (self.built_at is None):
+        self._build()
+
+  def refresh(self, app):
+    '''
+    Rebuilds the index in a background thread while searches keep using
+    the current one. Returns the thread, or None if a rebuild is already
+    running.
+    '''
+    if (not self._build_lock.acquire(blocking=False)):
+      return None
+
+    def rebuild():
+      try:
+        with app.app_context():
+          self._build()
+      except Exception:
+        app.logger.exception('search index rebuild failed')
+      finally:
+        self._build_lock.release()
+
+    thread = threading.Thread(target=rebuild, daemon=True)
+    thread.start()
+    return thread
+
+  def _reset(self):
+    self._postings = {}
+    self._tokens = {}
+    self._vocabulary = None
+
+  def _swap(self, fresh):
+    self._postings = fresh._postings
+    self._tokens = fresh._tokens
+    self._vocabulary = fresh._vocabulary
+
+  def _new_token(self, token):
+    self._postings[token] = set()
+    self._vocabulary = None
+
+  def _add(self, question_id, texts):
+    tokens = set()
+    for text in texts:
+      tokens |= tokenize(text)
+
+    self._tokens[question_id] = tokens
+    for token in tokens:
+      if (token not in self._postings):
+        self._new_token(token)
+      self._postings[token].add(question_id)
+
+  def add(self, question):
+    texts = [getattr(question, field) for field in self.fields]
+    with self._lock:
+      self._remove(question.id)
+      self._add(question.id, texts)
+      if (self._pending is not None):
+        self._pending.append((question.id, texts))
+
+  def _remove(self, question_id):
+    for token in self._tokens.pop(question_id, ()):
+      posting = self._postings[token]
+      posting.discard(question_id)
+      if (not posting):
+        del self._postings[token]
+        self._vocabulary = None
+
+  def remove(self, question_id):
+    with self._lock:
+      self._remove(question_id)
+      if (self._pending is not None):
+        self._pending.append((question_id, None))
+
+  def invalidate(self):
+    with self._lock:
+      self.stale = True
+
+  def search(self, text):
+    '''
+    Returns the sorted ids of questions containing every token of text.
+    '''
+    tokens = tokenize(text)
+    if (not tokens):
+      return []
+
+    with self._lock:
+      postings = sorted((self._postings.get(token, set()) for token in tokens),
+                        key=len)
+      matches = set(postings[0])
+      for posting in postings[1:]:
+        matches &= posting
+        if (not matches):
+          break
+
+    return sorted(matches)
+
+  def suggest(self, prefix, limit):
+    '''
+    Returns up to limit tokens starting with prefix, the ones found in
+    the most questions first. The tokens are kept in a sorted array, so
+    the matching range is found by binary search.
+    '''
+    prefix = prefix.lower()
+    with self._lock:
+      if (self._vocabulary is None):
+        self._vocabulary = sorted(self._postings)
+      vocabulary = self._vocabulary
+
+      start = bisect.bisect_left(vocabulary, prefix)
+      end = bisect.bisect_left(vocabulary, prefix + '\U0010ffff', start)
+      matches = ((len(self._postings[token]), token)
+                 for token in vocabulary[start:end])
+      best = heapq.nsmallest(limit, matches, key=lambda match: (-match[0], match[1]))
+
+    return [token for count, token in best]
+
+def edit_distance(a, b):
+  '''
+  Levenshtein distance between two words.
+  '''
+  if (len(a) < len(b)):
+    a, b = b, a
+
+  previous = list(range(len(b) + 1))
+  for i, char_a in enumerate(a, 1):
+    current = [i]
+    for j, char_b in enumerate(b, 1):
+      current.append(min(previous[j] + 1,
+                         current[j - 1] + 1,
+                         previous[j - 1] + (char_a != char_b)))
+    previous = current
+
+  return previous[-1]
+
+def max_typos(token):
+  '''
+  Number of typos tolerated in a word of the given length.
+  '''
+  if (len(token) <= 3):
+    return 0
+  if (len(token) <= 6):
+    return 1
+  return 2
+
+class BKTree:
+  '''
+  Burkhard-Keller tree of words. Finding the words within a distance of a
+  query only visits children whose edge distance could hold a match, by
+  the triangle inequality, instead of comparing against every word.
+  '''
+
+  def __init__(self):
+    self._root = None
+
+  def add(self, word):
+    if (self._root is None):
+      self._root = (word, {})
+      return
+
+    node = self._root
+    while (True):
+      distance = edit_distance(word, node[0])
+      if (distance == 0):
+        return
+      child = node[1].get(distance)
+      if (child is None):
+        node[1][distance] = (word, {})
+        return
+      node = child
+
+  def find(self, word, max_distance):
+    '''
+    Returns the words within max_distance edits of word.
+    '''
+    matches = []
+    nodes = [self._root] if self._root is not None else []
+    while (nodes):
+      node_word, children = nodes.pop()
+      distance = edit_distance(word, node_word)
+      if (distance <= max_distance):
+        matches.append(node_word)
+      for edge, child in children.items():
+        if (distance - max_distance <= edge <= distance + max_distance):
+          nodes.append(child)
+
+    return matches
+
+class FuzzyIndex(InvertedIndex):
+  '''
+  Inverted index whose searches tolerate typos. Each query word is
+  expanded to the indexed words within max_typos edits, found through
+  a BK-tree over the vocabulary, and their postings are merged. The tree
+  is the costly part of a rebuild, so it is grown in the fresh index and
+  swapped in with the postings.
+  '''
+
+  def _reset(self):
+    super()._reset()
+    self._tree = BKTree()
+
+  def _swap(self, fresh):
+    super()._swap(fresh)
+    self._tree = fresh._tree
+
+  def _new_token(self, token):
+    super()._new_token(token)
+    self._tree.add(token)
+
+  def search(self, text):
+    '''
+    Returns the sorted ids of questions holding a close match
+    for every token of text.
+    '''
+    tokens = tokenize(text)
+    if (not tokens):
+      return []
+
+    with self._lock:
+      matches = None
+      for token in tokens:
+        posting = set()
+        for word in self._tree.find(token, max_typos(token)):
+          # words of deleted questions stay in the tree without postings
+          posting |= self._postings.get(word, set())
+
+        matches = posting if matches is None else matches & posting
+        if (not matches):
+          break
+
+    return sorted(matches)
+
+def init_app(app):
+  '''
+  Attaches the question search indexes to the app: 'words' over question
+  text and 'fuzzy' over question and answer text.
+  With SEARCH_INDEX set they are built at startup, otherwise on first use.
+  They are rebuilt in the background after SEARCH_INDEX_TTL seconds, to
+  pick up writes made by other processes, and after bulk writes.
+  '''
+  app.config.setdefault('SEARCH_INDEX', False)
+  app.config.setdefault('SEARCH_INDEX_TTL', SEARCH_INDEX_TTL)
+  app.extensions['trivia_search_index'] = {
+      'words': InvertedIndex(fields=('question',)),
+      'fuzzy': FuzzyIndex(fields=('question', 'answer'))
+  }
+
+  if (app.config['SEARCH_INDEX']):
+    with app.app_context():
+      for index in app.extensions['trivia_search_index'].values():
+        index.build()
+
+def get_index(name='words'):
+  '''
+  Returns one of the app's search indexes, building it if it is missing.
+  A stale index is still returned while it is rebuilt in the background.
+  '''
+  index = current_app.extensions['trivia_search_index'][name]
+  ttl = current_app.config['SEARCH_INDEX_TTL']
+  if (index.built_at is None):
+    # there is nothing to search yet, so the first search waits for it
+    index.ensure_built()
+  elif (index.stale or time.monotonic() - index.built_at > ttl):
+    index.refresh(current_app._get_current_object())
+
+  return index
+
+def search(search_term):
+  '''
+  Returns the sorted ids of questions whose text holds every word of the term.
+  '''
+  return get_index().search(search_term)
+
+def fuzzy_search(search_term):
+  '''
+  Returns the sorted ids of questions whose question or answer text holds
+  every word of the term, allowing a few typos per word.
+  '''
+  return get_index('fuzzy').search(search_term)
+
+def suggest(prefix, limit):
+  '''
+  Returns the most common question words starting with prefix.
+  '''
+  return get_index().suggest(prefix, limit)
+
+@on_write
+def update_on_write(model, action, instance):
+  if ((model is not Question) or (not has_app_context())
+          or ('trivia_search_index' not in current_app.extensions)):
+    return
+
+  for index in current_app.extensions['trivia_search_index'].values():
+    if (index.built_at is None):
+      continue
+
+    if (action == 'bulk'):
+      # rebuilt after the next search rather than applied row by row
+      index.invalidate()
+    elif (action == 'delete'):
+      index.remove(instance.id)
+    else:
+      index.add(instance)
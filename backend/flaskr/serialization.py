@@ -0,0 +1,30 @@
+from flask import current_app, Response
+
+# shared with the async app, which can't import flask
+from api_common import get_serializer
+
+def init_app(app):
+  '''
+  Picks the JSON serializer of the app: JSON_SERIALIZER if set,
+  otherwise orjson when it is installed and json if not.
+  '''
+  app.config.setdefault('JSON_SERIALIZER', None)
+  app.extensions['trivia_serializer'] = get_serializer(
+      app.config['JSON_SERIALIZER'])
+
+def dumps(payload):
+  return current_app.extensions['trivia_serializer'](payload)
+
+def json_response(payload, status=200):
+  '''
+  Builds a JSON response with the app's serializer, in place of jsonify.
+  '''
+  return Response(dumps(payload), status=status, mimetype='application/json')
+
+def rows_to_objects(keys, rows):
+  '''
+  Turns row tuples from a column query into JSON objects. The rows are
+  zipped straight with the column names, skipping ORM instances and
+  per-row format() calls.
+  '''
+  return [dict(zip(keys, row)) for row in rows]
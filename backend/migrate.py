@@ -0,0 +1,81 @@
+import os
+import sys
+
+MIGRATIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               'migrations')
+
+# arbitrary key for the advisory lock held while migrating, so that
+# workers starting together don't apply the same migration twice
+MIGRATION_LOCK_KEY = 727274
+
+'''
+list_migrations()
+    returns (version, path) for every .sql file in migrations/,
+    in the order they are applied
+'''
+def list_migrations(path=MIGRATIONS_PATH):
+    migrations = []
+    for filename in sorted(os.listdir(path)):
+        if filename.endswith('.sql'):
+            migrations.append((filename[:-len('.sql')],
+                               os.path.join(path, filename)))
+    return migrations
+
+'''
+run_migrations(engine)
+    applies the migrations that haven't been recorded in the
+    schema_migrations table yet, each in its own transaction,
+    and returns the versions applied
+'''
+def run_migrations(engine, path=MIGRATIONS_PATH):
+    applied = []
+    # the raw DBAPI connection runs each file as is, with several
+    # statements and dollar quoting, without parameter parsing
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        # migrations and waiting for the lock aren't bound by the
+        # statement timeout the app sets for its requests
+        cursor.execute('SET statement_timeout = 0')
+        cursor.execute('SELECT pg_advisory_lock(%s)', (MIGRATION_LOCK_KEY,))
+        try:
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS public.schema_migrations (
+                    version text PRIMARY KEY,
+                    applied_at timestamptz NOT NULL DEFAULT now()
+                )''')
+            connection.commit()
+
+            cursor.execute('SELECT version FROM public.schema_migrations')
+            done = {version for (version,) in cursor.fetchall()}
+
+            for version, filename in list_migrations(path):
+                if version in done:
+                    continue
+                with open(filename) as migration:
+                    cursor.execute(migration.read())
+                cursor.execute(
+                    'INSERT INTO public.schema_migrations (version) VALUES (%s)',
+                    (version,))
+                connection.commit()
+                applied.append(version)
+        finally:
+            # drop a failed migration, then release the lock, which
+            # belongs to the session and would outlive the transaction
+            connection.rollback()
+            cursor.execute('SELECT pg_advisory_unlock(%s)', (MIGRATION_LOCK_KEY,))
+            cursor.execute('RESET statement_timeout')
+            connection.commit()
+    finally:
+        connection.close()
+
+    return applied
+
+# apply the migrations to a database given on the command line
+if __name__ == '__main__':
+    from sqlalchemy import create_engine
+    from models import database_path
+
+    engine = create_engine(sys.argv[1] if len(sys.argv) > 1 else database_path)
+    for version in run_migrations(engine):
+        print('applied ' + version)
@@ -0,0 +1,21 @@
+--
+-- Initial schema
+--
+-- Creates the categories and questions tables for empty databases.
+-- Databases restored from trivia.psql already have them and are left
+-- unchanged.
+--
+
+CREATE TABLE IF NOT EXISTS public.categories (
+    id serial PRIMARY KEY,
+    type text
+);
+
+CREATE TABLE IF NOT EXISTS public.questions (
+    id serial PRIMARY KEY,
+    question text,
+    answer text,
+    difficulty integer,
+    category integer CONSTRAINT category REFERENCES public.categories (id)
+        ON UPDATE CASCADE ON DELETE SET NULL
+);
@@ -0,0 +1,27 @@
+--
+-- Full-text search over questions.question
+--
+-- Adds a tsvector column kept up to date by a trigger, fills it for the
+-- existing rows and indexes it with GIN. Safe to run more than once.
+--
+
+ALTER TABLE public.questions ADD COLUMN IF NOT EXISTS search_vector tsvector;
+
+CREATE OR REPLACE FUNCTION public.questions_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := to_tsvector('english', coalesce(NEW.question, ''));
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS questions_search_vector_update ON public.questions;
+
+CREATE TRIGGER questions_search_vector_update
+    BEFORE INSERT OR UPDATE OF question ON public.questions
+    FOR EACH ROW EXECUTE PROCEDURE public.questions_search_vector_update();
+
+UPDATE public.questions
+    SET search_vector = to_tsvector('english', coalesce(question, ''));
+
+CREATE INDEX IF NOT EXISTS questions_search_vector_idx
+    ON public.questions USING gin (search_vector);
@@ -0,0 +1,27 @@
+--
+-- Trigram indexes for substring search over questions
+--
+-- Lets ILIKE '%term%' on question and answer use GIN index scans.
+-- Databases without the pg_trgm extension are left unchanged and
+-- trigram searches keep working as sequential scans. Safe to run
+-- more than once.
+--
+
+DO $$
+BEGIN
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+EXCEPTION WHEN OTHERS THEN
+    RAISE NOTICE 'pg_trgm is not available, skipping trigram indexes';
+END
+$$;
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') THEN
+        CREATE INDEX IF NOT EXISTS questions_question_trgm_idx
+            ON public.questions USING gin (question gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS questions_answer_trgm_idx
+            ON public.questions USING gin (answer gin_trgm_ops);
+    END IF;
+END
+$$;
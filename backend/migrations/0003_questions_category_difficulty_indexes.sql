@@ -0,0 +1,13 @@
+--
+-- Indexes for category browsing and quiz sampling
+--
+-- (category, id) serves category listings ordered by id, keyset pages
+-- within a category and the id lookups of quiz sampling as index range
+-- scans. Safe to run more than once.
+--
+
+CREATE INDEX IF NOT EXISTS questions_category_id_idx
+    ON public.questions (category, id);
+
+CREATE INDEX IF NOT EXISTS questions_difficulty_idx
+    ON public.questions (difficulty);
@@ -1,8 +1,13 @@
 import os
 from sqlalchemy import Column, String, Integer, create_engine
-from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred
 import json
 
+from migrate import run_migrations
+from pool import engine_options, watch_pool
+from routing import RoutingSQLAlchemy, configure_replica, setup_replica
+
 database_name = "trivia"
 database_path = "postgresql://{}:{}@{}/{}".format(
     "student", 
@@ -10,18 +15,50 @@ database_path = "postgresql://{}:{}@{}/{}".format(
     "localhost:5432", 
     database_name
   )
-db = SQLAlchemy()
+# routes the reads of read-only requests to the replica, see routing.py
+db = RoutingSQLAlchemy()
 
 '''
 setup_db(app)
-    binds a flask application and a SQLAlchemy service
+    binds a flask application and a SQLAlchemy service, sizing the
+    connection pool from the DB_* settings (see pool.py) and adding
+    the read replica of DB_REPLICA_URI if set (see routing.py), and
+    brings the schema up to date with migrations/
 '''
 def setup_db(app, database_path=database_path):
     app.config["SQLALCHEMY_DATABASE_URI"] = database_path
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    # explicit SQLALCHEMY_ENGINE_OPTIONS win over the DB_* settings
+    options = engine_options(app.config, database_path)
+    options.update(app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {}))
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = options
+    configure_replica(app)
     db.app = app
     db.init_app(app)
-    db.create_all()
+    setup_replica(app, db)
+
+    engine = db.get_engine(app)
+    watch_pool(engine)
+    run_migrations(engine)
+    # close the migration connection so processes forked from this one,
+    # like preloaded gunicorn workers, open their own instead of sharing it
+    engine.dispose()
+
+'''
+on_write(hook)
+    registers hook(model, action, instance), called after a model
+    commits an insert, update or delete so in-process caches can
+    follow the database
+'''
+write_hooks = []
+
+def on_write(hook):
+    write_hooks.append(hook)
+    return hook
+
+def notify_write(model, action, instance=None):
+    for hook in write_hooks:
+        hook(model, action, instance)
 
 '''
 Question
@@ -35,6 +72,8 @@ class Question(db.Model):
   answer = Column(String)
   category = Column(String)
   difficulty = Column(Integer)
+  # maintained by a trigger, see migrations/0001_questions_search_vector.sql
+  search_vector = deferred(Column(TSVECTOR))
 
   def __init__(self, question, answer, category, difficulty):
     self.question = question
@@ -45,15 +84,22 @@ class Question(db.Model):
   def insert(self):
     db.session.add(self)
     db.session.commit()
+    notify_write(Question, 'insert', self)
   
   def update(self):
     db.session.commit()
+    notify_write(Question, 'update', self)
 
   def delete(self):
     db.session.delete(self)
     db.session.commit()
+    notify_write(Question, 'delete', self)
+
+  def format(self, fields=None):
+    if fields is not None:
+      # only touch the requested attributes, others may not be loaded
+      return {field: getattr(self, field) for field in fields}
 
-  def format(self):
     return {
       'id': self.id,
       'question': self.question,
@@ -75,6 +121,20 @@ class Category(db.Model):
   def __init__(self, type):
     self.type = type
 
+  def insert(self):
+    db.session.add(self)
+    db.session.commit()
+    notify_write(Category, 'insert', self)
+
+  def update(self):
+    db.session.commit()
+    notify_write(Category, 'update', self)
+
+  def delete(self):
+    db.session.delete(self)
+    db.session.commit()
+    notify_write(Category, 'delete', self)
+
   def format(self):
     return {
       'id': self.id,
@@ -0,0 +1,107 @@
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.engine.url import make_url
+
+# the settings are shared with the async app, which has no SQLAlchemy
+from api_common import (POOL_SETTINGS, DB_STATEMENT_TIMEOUT, DB_CONNECT_TIMEOUT,
+                        get_setting)
+
+'''
+engine_options(config, database_path)
+    returns the pool and connection options of the engine for
+    database_path, which the replica bind shares; SQLite has no
+    connection pool to size and no timeouts, so it gets none
+'''
+def engine_options(config, database_path):
+    backend = make_url(database_path).get_backend_name()
+    if backend == 'sqlite':
+        return {}
+
+    options = {option: get_setting(config, name, default, parse)
+               for option, name, default, parse in POOL_SETTINGS}
+
+    if backend == 'postgresql':
+        timeout = get_setting(config, 'DB_STATEMENT_TIMEOUT',
+                              DB_STATEMENT_TIMEOUT, int)
+        connect_timeout = get_setting(config, 'DB_CONNECT_TIMEOUT',
+                                      DB_CONNECT_TIMEOUT, int)
+        options['connect_args'] = {
+            'options': '-c statement_timeout={}'.format(timeout),
+            'connect_timeout': connect_timeout
+        }
+
+    return options
+
+'''
+PoolMetrics(engine)
+    counts the connection pool events of an engine; snapshot() returns
+    the counters with the current state of the pool
+'''
+class PoolMetrics:
+    def __init__(self, engine):
+        self.engine = engine
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.checked_out = 0
+        self.peak_checked_out = 0
+        self._lock = threading.Lock()
+
+        # engine listeners carry over to the pool that dispose() creates
+        event.listen(engine, 'connect', self.on_connect)
+        event.listen(engine, 'checkout', self.on_checkout)
+        event.listen(engine, 'checkin', self.on_checkin)
+        event.listen(engine, 'invalidate', self.on_invalidate)
+
+    def on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+
+    def on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            # connections invalidated while checked out are checked in too
+            self.checkins += 1
+            self.checked_out = max(self.checked_out - 1, 0)
+
+    def on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+    def snapshot(self):
+        pool = self.engine.pool
+        with self._lock:
+            stats = {
+                'connects': self.connects,
+                'checkouts': self.checkouts,
+                'checkins': self.checkins,
+                'invalidations': self.invalidations,
+                'checked_out': self.checked_out,
+                'peak_checked_out': self.peak_checked_out
+            }
+
+        # sizes only pools with a queue have
+        for name in ('size', 'checkedin', 'overflow'):
+            if hasattr(pool, name):
+                stats['pool_' + name] = getattr(pool, name)()
+        return stats
+
+pool_metrics = {}
+pool_metrics_lock = threading.Lock()
+
+'''
+watch_pool(engine)
+    returns the PoolMetrics of an engine, starting them on first use
+'''
+def watch_pool(engine):
+    with pool_metrics_lock:
+        if engine not in pool_metrics:
+            pool_metrics[engine] = PoolMetrics(engine)
+        return pool_metrics[engine]
@@ -0,0 +1,112 @@
+import random
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+# seconds an idle session is kept, and how many sessions are kept at most
+QUIZ_SESSION_TTL = 3600
+QUIZ_SESSION_LIMIT = 10000
+# questions shuffled into a session's deck
+QUIZ_DECK_SIZE = 100
+# questions a single /quizzes request can ask for
+QUIZ_MAX_COUNT = 50
+
+'''
+get_category_id(quiz_category)
+    returns the category id of a quiz_category payload, 0 meaning all
+    categories, or None if the payload is malformed
+'''
+def get_category_id(quiz_category):
+    if not isinstance(quiz_category, dict):
+        return None
+
+    try:
+        return int(quiz_category.get('id', 0))
+    except (TypeError, ValueError):
+        return None
+
+'''
+is_id_list(value)
+    returns True if value is a list of question ids, as previous_questions
+    must be
+'''
+def is_id_list(value):
+    return (isinstance(value, list)
+            and all(isinstance(item, int) and not isinstance(item, bool)
+                    for item in value))
+
+'''
+shuffle_deck(ids, size)
+    runs the first size steps of a Fisher-Yates shuffle over ids in
+    place and returns them, which is a uniformly random deck of that
+    many ids
+'''
+def shuffle_deck(ids, size):
+    size = min(size, len(ids))
+    for i in range(size):
+        j = random.randrange(i, len(ids))
+        ids[i], ids[j] = ids[j], ids[i]
+
+    return ids[:size]
+
+'''
+QuizSessionStore(ttl, limit)
+    holds the shuffled decks of running quiz sessions; sessions live in
+    process memory, so a deployment with several workers needs to route
+    a session's requests to the same worker. Idle sessions expire after
+    ttl seconds and at most limit are kept
+'''
+class QuizSessionStore:
+    def __init__(self, ttl, limit):
+        self.ttl = ttl
+        self.limit = limit
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _prune(self):
+        now = time.monotonic()
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session['expires'] > now and len(self._sessions) < self.limit:
+                break
+            del self._sessions[session_id]
+
+    def start(self, deck):
+        with self._lock:
+            self._prune()
+            session_id = secrets.token_urlsafe(16)
+            self._sessions[session_id] = {
+                'deck': deck,
+                'served': 0,
+                'expires': time.monotonic() + self.ttl
+            }
+            return session_id
+
+    # takes the next id off a session's deck; raises KeyError for
+    # unknown sessions and returns None for empty decks
+    def draw(self, session_id):
+        with self._lock:
+            session = self._sessions[session_id]
+            if session['expires'] <= time.monotonic():
+                del self._sessions[session_id]
+                raise KeyError(session_id)
+
+            # keep recently used sessions at the end for pruning
+            self._sessions.move_to_end(session_id)
+            session['expires'] = time.monotonic() + self.ttl
+            if not session['deck']:
+                return None
+            return session['deck'].pop()
+
+    def record_served(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session['served'] += 1
+
+    # ends a session and returns how many questions it served;
+    # raises KeyError for unknown sessions
+    def finish(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id)['served']
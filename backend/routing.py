@@ -0,0 +1,140 @@
+import logging
+import threading
+import time
+
+from flask import g, has_app_context
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import event, orm
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.sql.expression import UpdateBase
+
+from api_common import get_setting
+from pool import watch_pool
+
+logger = logging.getLogger(__name__)
+
+REPLICA_BIND = 'replica'
+# seconds between health checks of the replica
+DB_REPLICA_CHECK_INTERVAL = 10
+# seconds a client that wrote keeps reading from the primary, longer
+# than the replica is expected to lag
+DB_REPLICA_STICKY_SECONDS = 5
+
+'''
+ReplicaState(engine, check_interval)
+    tracks whether the replica engine can be used, checking it with
+    SELECT 1 at most every check_interval seconds and marking it down
+    as soon as one of its connections is lost; the check runs in the
+    request that finds it due, which DB_CONNECT_TIMEOUT (see api_common.py)
+    keeps from hanging on an unreachable replica
+'''
+class ReplicaState:
+    def __init__(self, engine, check_interval=DB_REPLICA_CHECK_INTERVAL):
+        self.engine = engine
+        self.check_interval = check_interval
+        self.healthy = True
+        self.checked_at = None
+        self._lock = threading.Lock()
+        event.listen(engine, 'handle_error', self.on_error)
+
+    def on_error(self, context):
+        if context.is_disconnect:
+            logger.warning('read replica disconnected, reading from the primary')
+            self.healthy = False
+
+    def available(self):
+        now = time.monotonic()
+        if (self.checked_at is not None
+                and now - self.checked_at < self.check_interval):
+            return self.healthy
+
+        # one request checks while the others go on with the last result
+        if not self._lock.acquire(blocking=False):
+            return self.healthy
+        try:
+            self.checked_at = now
+            with self.engine.connect() as connection:
+                connection.execute('SELECT 1')
+            if not self.healthy:
+                logger.info('read replica is back')
+            self.healthy = True
+        except SQLAlchemyError as e:
+            if self.healthy:
+                logger.warning('read replica unavailable, reading from '
+                               'the primary: %s', e)
+            self.healthy = False
+        finally:
+            self._lock.release()
+        return self.healthy
+
+'''
+reads_from_replica()
+    returns True while handling a request the app marked as read-only
+    by setting g.read_replica
+'''
+def reads_from_replica():
+    return has_app_context() and g.get('read_replica', False)
+
+'''
+RoutingSession
+    sends the queries of read-only requests to the replica, when one
+    is configured and healthy, and everything else to the primary;
+    flushes and INSERT, UPDATE and DELETE statements always go to the
+    primary
+'''
+class RoutingSession(SignallingSession):
+    def get_bind(self, mapper=None, clause=None):
+        replica = self.app.extensions.get('trivia_replica')
+        if (replica is not None and not self._flushing
+                and not isinstance(clause, UpdateBase)
+                and reads_from_replica() and replica.available()):
+            return replica.engine
+        return super().get_bind(mapper, clause)
+
+'''
+RoutingSQLAlchemy
+    a SQLAlchemy service whose sessions are RoutingSessions
+'''
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+'''
+configure_replica(app)
+    reads the replica URI from the DB_REPLICA_URI setting (see api_common.py)
+    and registers it as the replica bind of the app, or removes the bind
+    when there is no replica; call before db.init_app(app)
+'''
+def configure_replica(app):
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    replica_uri = get_setting(app.config, 'DB_REPLICA_URI', None)
+    if replica_uri:
+        binds[REPLICA_BIND] = replica_uri
+    else:
+        binds.pop(REPLICA_BIND, None)
+    app.config['SQLALCHEMY_BINDS'] = binds or None
+    return replica_uri
+
+replica_states = {}
+replica_states_lock = threading.Lock()
+
+'''
+setup_replica(app, db)
+    attaches the replica state to the app when configure_replica found
+    a replica; call after db.init_app(app)
+'''
+def setup_replica(app, db):
+    app.extensions.pop('trivia_replica', None)
+    if REPLICA_BIND not in (app.config.get('SQLALCHEMY_BINDS') or {}):
+        return
+
+    engine = db.get_engine(app, bind=REPLICA_BIND)
+    watch_pool(engine)
+    with replica_states_lock:
+        if engine not in replica_states:
+            replica_states[engine] = ReplicaState(engine)
+        state = replica_states[engine]
+
+    state.check_interval = get_setting(app.config, 'DB_REPLICA_CHECK_INTERVAL',
+                                       DB_REPLICA_CHECK_INTERVAL, int)
+    app.extensions['trivia_replica'] = state
@@ -1,20 +1,41 @@
 import React, { Component } from 'react';
+import $ from 'jquery';
 import '../stylesheets/Question.css';
 
 class Question extends Component {
   constructor(){
     super();
     this.state = {
-      visibleAnswer: false
+      visibleAnswer: false,
+      answer: undefined
     }
   }
 
   flipVisibility() {
+    if(!this.state.visibleAnswer && this.props.answer === undefined && this.state.answer === undefined) {
+      this.getAnswer();
+    }
     this.setState({visibleAnswer: !this.state.visibleAnswer});
   }
 
+  getAnswer() {
+    $.ajax({
+      url: `/questions/${this.props.id}?fields=answer`,
+      type: "GET",
+      success: (result) => {
+        this.setState({answer: result.question.answer})
+        return;
+      },
+      error: (error) => {
+        alert('Unable to load answer. Please try your request again')
+        return;
+      }
+    })
+  }
+
   render() {
-    const { question, answer, category, difficulty } = this.props;
+    const { question, category, difficulty } = this.props;
+    const answer = this.props.answer !== undefined ? this.props.answer : this.state.answer;
     return (
       <div className="Question-holder">
         <div className="Question">{question}</div>
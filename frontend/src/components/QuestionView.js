@@ -5,6 +5,9 @@ import Question from './Question';
 import Search from './Search';
 import $ from 'jquery';
 
+// answers are left out of lists and fetched when a question shows its answer
+const listFields = 'id,question,category,difficulty';
+
 class QuestionView extends Component {
   constructor(){
     super();
@@ -23,7 +26,7 @@ class QuestionView extends Component {
 
   getQuestions = () => {
     $.ajax({
-      url: `/questions?page=${this.state.page}`, //TODO: update request URL
+      url: `/questions?page=${this.state.page}&fields=${listFields}`, //TODO: update request URL
       type: "GET",
       success: (result) => {
         this.setState({
@@ -60,7 +63,7 @@ class QuestionView extends Component {
 
   getByCategory= (id) => {
     $.ajax({
-      url: `/categories/${id}/questions`, //TODO: update request URL
+      url: `/categories/${id}/questions?fields=${listFields}`, //TODO: update request URL
       type: "GET",
       success: (result) => {
         this.setState({
@@ -78,7 +81,7 @@ class QuestionView extends Component {
 
   submitSearch = (searchTerm) => {
     $.ajax({
-      url: `/questions`, //TODO: update request URL
+      url: `/questions?fields=${listFields}`, //TODO: update request URL
       type: "POST",
       dataType: 'json',
       contentType: 'application/json',
@@ -105,7 +108,7 @@ class QuestionView extends Component {
     if(action === 'DELETE') {
       if(window.confirm('Are you sure you want to delete the question?')) {
         $.ajax({
-          url: `/questions/${id}`, //TODO: update request URL
+          url: `/questions/${id}?return=minimal`, //TODO: update request URL
           type: "DELETE",
           success: (result) => {
             this.getQuestions()
@@ -139,6 +142,7 @@ class QuestionView extends Component {
           {this.state.questions.map((q, ind) => (
             <Question
               key={q.id}
+              id={q.id}
               question={q.question}
               answer={q.answer}
               category={this.state.categories[q.category]} 
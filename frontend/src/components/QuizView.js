@@ -11,6 +11,7 @@ class QuizView extends Component {
     this.state = {
         quizCategory: null,
         previousQuestions: [], 
+        round: [],
         showAnswer: false,
         categories: {},
         numCorrect: 0,
@@ -36,47 +37,55 @@ class QuizView extends Component {
   }
 
   selectCategory = ({type, id=0}) => {
-    this.setState({quizCategory: {type, id}}, this.getNextQuestion)
+    this.setState({quizCategory: {type, id}}, this.getRound)
   }
 
   handleChange = (event) => {
     this.setState({[event.target.name]: event.target.value})
   }
 
-  getNextQuestion = () => {
-    const previousQuestions = [...this.state.previousQuestions]
-    if(this.state.currentQuestion.id) { previousQuestions.push(this.state.currentQuestion.id) }
-
+  getRound = () => {
     $.ajax({
       url: '/quizzes', //TODO: update request URL
       type: "POST",
       dataType: 'json',
       contentType: 'application/json',
       data: JSON.stringify({
-        previous_questions: previousQuestions,
-        quiz_category: this.state.quizCategory
+        previous_questions: [],
+        quiz_category: this.state.quizCategory,
+        count: questionsPerPlay
       }),
       xhrFields: {
         withCredentials: true
       },
       crossDomain: true,
       success: (result) => {
-        this.setState({
-          showAnswer: false,
-          previousQuestions: previousQuestions,
-          currentQuestion: result.question,
-          guess: '',
-          forceEnd: result.question ? false : true
-        })
+        this.setState({ round: result.questions }, this.getNextQuestion)
         return;
       },
       error: (error) => {
-        alert('Unable to load question. Please try your request again')
+        alert('Unable to load questions. Please try your request again')
         return;
       }
     })
   }
 
+  getNextQuestion = () => {
+    const previousQuestions = [...this.state.previousQuestions]
+    if(this.state.currentQuestion.id) { previousQuestions.push(this.state.currentQuestion.id) }
+
+    // the whole round was loaded up front, so the next question is local
+    const [currentQuestion, ...round] = this.state.round
+    this.setState({
+      showAnswer: false,
+      previousQuestions: previousQuestions,
+      currentQuestion: currentQuestion,
+      round: round,
+      guess: '',
+      forceEnd: currentQuestion ? false : true
+    })
+  }
+
   submitGuess = (event) => {
     event.preventDefault();
     const formatGuess = this.state.guess.replace(/[.,\/#!$%\^&\*;:{}=\-_`~()]/g,"").toLowerCase()
@@ -91,6 +100,7 @@ class QuizView extends Component {
     this.setState({
       quizCategory: null,
       previousQuestions: [], 
+      round: [],
       showAnswer: false,
       numCorrect: 0,
       currentQuestion: {},